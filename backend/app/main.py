@@ -1,12 +1,59 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import logging
+import os
+import threading
+import time
+
 from flask import Flask
 from flask_cors import CORS
+from app.json_provider import OrjsonProvider, orjson
 from app.routes.assessment import assessment_bp
+from app.services import pdf_parser
+from app.config import PROJECT_ID
+
+try:
+    from app.services import vertex_summarizer
+except Exception:  # optional dependency (google-cloud-aiplatform)
+    vertex_summarizer = None  # type: ignore
+
+# Services log through the logging module; keep production output to warnings by default
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def _warmup():
+    """Move one-time client/pool setup off the first request's critical path."""
+    start = time.perf_counter()
+    try:
+        pdf_parser.warm_up()
+        if vertex_summarizer is not None and PROJECT_ID:
+            vertex_summarizer.warm_up()
+    except Exception as e:
+        logger.warning("Warmup failed: %s", e)
+        return
+    logger.info("Warmup completed in %.2fs", time.perf_counter() - start)
+
+
+def start_warmup():
+    """
+    Warm up in the background in the serving process.
+
+    Called from __main__ and gunicorn's post_fork hook rather than at import:
+    process-pool workers re-import this module (as __mp_main__) and must not
+    warm up, or each one would start a pool of its own.
+    """
+    threading.Thread(target=_warmup, name="warmup", daemon=True).start()
+
 
 def create_app():
     app = Flask(__name__)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     CORS(app)
 
     app.register_blueprint(
@@ -26,4 +73,5 @@ def create_app():
 app = create_app()
 
 if __name__ == "__main__":
+    start_warmup()
     app.run(debug=True)
@@ -1,15 +1,26 @@
-from flask import Blueprint, request, jsonify
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 
 from app.services.session_store import (
     sessions,
     create_session,
     get_session,
     add_question,
+    add_questions,
     add_response,
+    find_question,
     set_confidence,
 )
 
-from app.services.question_generator import generate_question, generate_batch_questions
+from app.services.question_generator import (
+    generate_question,
+    generate_batch_questions,
+    iter_batch_questions_as_completed,
+)
 from app.services.gemini_analyzer import analyze_response
 from app.services.pdf_parser import (
     extract_text_from_pdf_bytes,
@@ -20,41 +31,111 @@ from app.services.pdf_parser import (
 from app.services.concept_extractor import extract_concepts
 from app.services.explanation_engine import explain_concept
 from app.services.confidence_engine import evaluate_concept
+from app.services.cache import TTLCache, content_hash, stream_content_hash
+from app.services import llm_cache
+from app.config import PROJECT_ID
+
+try:
+    from app.services.vertex_summarizer import summarize_text
+except Exception:  # optional dependency (google-cloud-aiplatform)
+    summarize_text = None  # type: ignore
+
+# Resolved once per process: without the SDK or a project every Vertex
+# call would just fail, so /ingest goes straight to the heuristic summary.
+_VERTEX_OK = summarize_text is not None and bool(PROJECT_ID)
 
 assessment_bp = Blueprint("assessment", __name__)
+logger = logging.getLogger(__name__)
+
+# Serialized /ingest responses keyed by a hash of the uploaded content, so
+# repeat uploads skip OCR, parsing and summarization entirely.
+INGEST_CACHE_TTL_SECONDS = 3600
+_ingest_cache = TTLCache(maxsize=64, ttl=INGEST_CACHE_TTL_SECONDS)
+
+# Background threads for network-bound Vertex summarization. Every request
+# thread may be waiting on one, so the pool matches gunicorn's thread count
+# (threads are only started as needed).
+_summary_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GUNICORN_THREADS", "64")),
+    thread_name_prefix="vertex-summary",
+)
+
+@assessment_bp.after_request
+def _add_etag(response: Response) -> Response:
+    """Tag GET and /ingest bodies with an ETag and honor If-None-Match.
+
+    /ingest bodies are stable for identical uploads (see _ingest_cache),
+    so clients refetching after a network error can get a bodiless 304.
+    """
+    if response.status_code != 200 or response.direct_passthrough:
+        return response
+    if request.method != "GET" and request.endpoint != "assessment.ingest_content":
+        return response
+    response.add_etag()
+    etag, _ = response.get_etag()
+    if etag in request.if_none_match:
+        response.status_code = 304
+        response.set_data(b"")
+    return response
+
 
 @assessment_bp.route("/ingest", methods=["POST"])
 def ingest_content():
     """Ingest PDF or raw text and return topics/concepts."""
     summary_source = ""
     if "pdf" in request.files:
-        pdf_file = request.files["pdf"]
-        text, summary_source = extract_text_prefer_document_ai(pdf_file.read())
+        pdf_stream = request.files["pdf"].stream
+        cache_key = "pdf:" + stream_content_hash(pdf_stream)
+        cached = _ingest_cache.get(cache_key)
+        if cached is not None:
+            return _cached_ingest_response(cached)
+        text, summary_source = extract_text_prefer_document_ai(pdf_stream)
     else:
         payload = request.get_json(silent=True) or {}
         text = payload.get("text", "")
         summary_source = "raw_text"
+        cache_key = "text:" + content_hash(text.encode("utf-8"))
+        cached = _ingest_cache.get(cache_key) if text else None
+        if cached is not None:
+            return _cached_ingest_response(cached)
 
     if not text:
         return jsonify({"error": "No content provided"}), 400
 
+    # Vertex round-trip overlaps the local (CPU-bound) parsing below
+    summary_future = _summary_pool.submit(_safe_vertex_summarize, text) if _VERTEX_OK else None
+
     parsed = parse_document(text)
     # Add lightweight summaries via concept extractor
     concepts = extract_concepts(text)
     parsed["concepts"] = concepts
 
-    summary = None
-    try:
-        from app.services.vertex_summarizer import summarize_text
+    summary = summary_future.result() if summary_future is not None else None
+    if summary is None:
+        summary = build_structured_summary(text, parsed.get("topics", []), concepts)
+        summary["source"] = summary_source or "heuristic"
+
+    response = jsonify({"success": True, **parsed, "summary": summary})
+    _ingest_cache.set(cache_key, response.get_data())
+    response.headers["X-Cache"] = "MISS"
+    return response
+
 
+def _safe_vertex_summarize(text: str):
+    """Summarize with Vertex AI; return None so callers fall back to heuristics."""
+    try:
         summary = summarize_text(text)
         summary["source"] = "vertex_ai"
+        return summary
     except Exception as e:
-        print(f"[Vertex] Summarization fallback to heuristic: {e}")
-        summary = build_structured_summary(text, parsed.get("topics", []), concepts)
-        summary["source"] = summary_source or "heuristic"
+        logger.warning("Vertex summarization failed, using heuristic summary: %s", e)
+        return None
+
 
-    return jsonify({"success": True, **parsed, "summary": summary})
+def _cached_ingest_response(body: bytes) -> Response:
+    response = Response(body, mimetype="application/json")
+    response.headers["X-Cache"] = "HIT"
+    return response
 
 
 @assessment_bp.route("/explain", methods=["POST"])
@@ -66,7 +147,9 @@ def explain():
     if not title or not content:
         return jsonify({"error": "title and content are required"}), 400
     result = explain_concept(title, content)
-    return jsonify({"success": True, "explanation": result})
+    response = jsonify({"success": True, "explanation": result})
+    response.headers["X-LLM-Cache"] = llm_cache.last_status()
+    return response
 
 
 @assessment_bp.route("/generate-question", methods=["POST"])
@@ -101,7 +184,7 @@ def generate_batch():
     if difficulty not in ["easy", "moderate", "hard"]:
         difficulty = "moderate"
     
-    print(f"[BATCH] Generating {count} questions for domain: {domain}, difficulty: {difficulty}")
+    logger.info("Generating %s questions for domain: %s, difficulty: %s", count, domain, difficulty)
     
     # Create session
     session_id = create_session(domain, "Confidence Assessment")
@@ -110,8 +193,7 @@ def generate_batch():
     questions = generate_batch_questions(domain, count, difficulty)
     
     # Store questions in session
-    for q in questions:
-        add_question(session_id, q)
+    add_questions(session_id, questions)
     
     return jsonify({
         "success": True,
@@ -120,6 +202,43 @@ def generate_batch():
     })
 
 
+@assessment_bp.route("/generate-batch/stream", methods=["POST"])
+def generate_batch_stream():
+    """
+    Streaming variant of /generate-batch for progressive rendering.
+    Expects: {"domain": str, "count": int, "difficulty": str}
+    Returns NDJSON, one object per line:
+      {"type": "session", "session_id": str, "count": int}
+      {"type": "question", "index": int, "question": dict}   (as each is ready, any order)
+      {"type": "done", "session_id": str}
+    Each question is stored in the session before it is sent, so it can be
+    answered while the rest of the batch is still generating.
+    """
+    payload = request.get_json(silent=True) or {}
+    domain = payload.get("domain", "general")
+    count = payload.get("count", 10)
+    difficulty = payload.get("difficulty", "moderate")
+
+    # Validate difficulty
+    if difficulty not in ["easy", "moderate", "hard"]:
+        difficulty = "moderate"
+
+    session_id = create_session(domain, "Confidence Assessment")
+
+    def ndjson():
+        dumps = current_app.json.dumps
+        yield dumps({"type": "session", "session_id": session_id, "count": count}) + "\n"
+        for index, question in iter_batch_questions_as_completed(domain, count, difficulty):
+            add_question(session_id, question)
+            yield dumps({"type": "question", "index": index, "question": question}) + "\n"
+        yield dumps({"type": "done", "session_id": session_id}) + "\n"
+
+    response = Response(stream_with_context(ndjson()), mimetype="application/x-ndjson")
+    # Ask reverse proxies not to buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @assessment_bp.route("/evaluate", methods=["POST"])
 def evaluate():
     """Evaluate a user's answer and compute concept confidence."""
@@ -143,7 +262,9 @@ def evaluate():
         "confidence": result,
         "insights": insights,
     }
-    return jsonify(resp)
+    response = jsonify(resp)
+    response.headers["X-LLM-Cache"] = llm_cache.last_status()
+    return response
 
 
 @assessment_bp.route("/start", methods=["POST"])
@@ -167,12 +288,11 @@ def get_question(session_id: str):
     if not session:
         return jsonify({"error": "invalid session"}), 404
 
-    subject = session.get("subject", "General")
-    topic = session.get("topic", "Concept")
+    subject = session.subject
+    topic = session.topic
     q = generate_question(subject, topic, "medium")
 
     # Shape to UI expectations
-    import uuid
     question_id = str(uuid.uuid4())
     ui_q = {
         "question_id": question_id,
@@ -207,13 +327,12 @@ def submit_answer():
         return jsonify({"error": "invalid session"}), 404
 
     # Find question text
-    q_list = session.get("questions", [])
-    q_item = next((q for q in q_list if q.get("question_id") == question_id), None)
+    q_item = find_question(session_id, question_id)
     if not q_item:
         return jsonify({"error": "question not found"}), 404
 
-    analysis = analyze_response(q_item["question"], explanation)
-    concept = session.get("topic", "Concept")
+    analysis = analyze_response(q_item.question, explanation)
+    concept = session.topic
     confidence = evaluate_concept(concept, [analysis])
 
     add_response(session_id, {
@@ -230,4 +349,6 @@ def submit_answer():
         "reasoning_quality": analysis.get("reasoning_quality", 0),
         "feedback": analysis.get("short_feedback", "Review your reasoning."),
     }
-    return jsonify(result)
+    response = jsonify(result)
+    response.headers["X-LLM-Cache"] = llm_cache.last_status()
+    return response
@@ -0,0 +1,82 @@
+"""
+In-process caching utilities.
+
+A small thread-safe LRU cache with optional expiry, used to memoize
+expensive results (OCR, LLM calls, parsing) within a backend process.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import IO, Any, Dict, Hashable, Optional, Tuple
+
+
+def content_hash(data: bytes) -> str:
+    """Return a hex SHA-256 digest of ``data`` for use as a cache key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def stream_content_hash(stream: IO[bytes], chunk_size: int = 1024 * 1024) -> str:
+    """Hash a seekable binary stream in chunks, then rewind it."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after ``ttl`` seconds.
+
+    ``ttl=None`` disables expiry. Like the session store this lives in
+    process memory, so each worker keeps its own copy.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for ``key``, or None if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
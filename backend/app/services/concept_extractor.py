@@ -4,29 +4,38 @@ Concept extraction utilities.
 Given raw text, derive concept-level chunks with titles and summaries.
 """
 from typing import List, Dict, Any
-from .pdf_parser import normalize_text, split_into_sections
+from .pdf_parser import normalize_text, pick_key_points, split_into_sections, split_sentences
 
 
 def extract_concepts(text: str) -> List[Dict[str, Any]]:
-    """Return a list of concept dicts: {title, content, summary}."""
+    """Return a list of concept dicts: {title, content, summary, key_points}.
+
+    Each section is split into sentences once; both the summary and the
+    key points are taken from that split.
+    """
     clean = normalize_text(text)
     sections = split_into_sections(clean)
     concepts: List[Dict[str, Any]] = []
     for title, content in sections:
-        summary = summarize(content)
-        concepts.append({"title": title, "content": content, "summary": summary})
+        sentences = split_sentences(content)
+        concepts.append({
+            "title": title,
+            "content": content,
+            "summary": _summarize_sentences(sentences, content),
+            "key_points": pick_key_points(sentences),
+        })
     return concepts
 
 
 def summarize(text: str, max_len: int = 240) -> str:
     """Very simple extractive summary: take the first sentences until max_len."""
-    import re
-    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return _summarize_sentences(split_sentences(text), text, max_len)
+
+
+def _summarize_sentences(sentences: List[str], text: str, max_len: int = 240) -> str:
     out: List[str] = []
     total = 0
     for s in sentences:
-        if not s:
-            continue
         if total + len(s) > max_len:
             break
         out.append(s)
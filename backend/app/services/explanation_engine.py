@@ -4,19 +4,15 @@ Concept explanation engine.
 Generates simple-language explanations with real-world examples.
 Uses Gemini when available; falls back to rule-based formatting.
 """
+import json
 from typing import Dict
+from . import llm_cache
 from .gemini_analyzer import call_gemini
 
 
-def explain_concept(title: str, content: str) -> Dict[str, str]:
-    """
-    Return structured JSON:
-    {
-      "concept": title,
-      "explanation": str,
-      "example": str,
-    }
-    """
+@llm_cache.cached(ttl=3600)
+def _gemini_explanation(title: str, content: str) -> Dict[str, str]:
+    """Ask Gemini for an explanation/example pair. Raises on any failure."""
     prompt = f"""
 You are a learning assistant.
 Explain the concept below in simple language and provide a practical example.
@@ -29,15 +25,26 @@ Return STRICT JSON with keys:
 - example (string)
 Only return JSON.
 """
+    text = call_gemini(prompt)
+    data = json.loads(text)
+    return {
+        "concept": title,
+        "explanation": data.get("explanation", ""),
+        "example": data.get("example", ""),
+    }
+
+
+def explain_concept(title: str, content: str) -> Dict[str, str]:
+    """
+    Return structured JSON:
+    {
+      "concept": title,
+      "explanation": str,
+      "example": str,
+    }
+    """
     try:
-        import json
-        text = call_gemini(prompt)
-        data = json.loads(text)
-        return {
-            "concept": title,
-            "explanation": data.get("explanation", ""),
-            "example": data.get("example", ""),
-        }
+        return _gemini_explanation(title, content)
     except Exception:
         # Fallback: simple rephrasing
         explanation = f"{title}: In simple terms, this refers to {content[:180]}..."
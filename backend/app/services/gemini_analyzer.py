@@ -2,6 +2,9 @@ import os
 import requests
 import json
 import re
+from typing import Iterator, Optional
+
+from app.services import llm_cache
 
 # Read Gemini config from environment
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -9,6 +12,8 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
 GEMINI_API_VERSION = os.getenv("GEMINI_API_VERSION", "v1beta")
 GEMINI_BASE = "https://generativelanguage.googleapis.com"
+# Upper bound on in-flight Gemini requests per batch; size to the QPM tier.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
 
 
 def _list_models() -> list:
@@ -74,17 +79,37 @@ def _resolve_supported_model(preferred_alias: str) -> str:
     return preferred_alias
 
 
+_FENCE_JSON_OPEN = re.compile(r"^```json\s*", re.MULTILINE)
+_FENCE_OPEN = re.compile(r"^```\s*", re.MULTILINE)
+_FENCE_CLOSE = re.compile(r"```\s*$", re.MULTILINE)
+
+
 def _strip_markdown_fences(text: str) -> str:
-    text = re.sub(r"^```json\s*", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^```\s*", "", text, flags=re.MULTILINE)
-    text = re.sub(r"```\s*$", "", text, flags=re.MULTILINE)
+    text = _FENCE_JSON_OPEN.sub("", text)
+    text = _FENCE_OPEN.sub("", text)
+    text = _FENCE_CLOSE.sub("", text)
     return text.strip()
 
 
-def call_gemini(prompt: str) -> str:
+def _content_payload(prompt: str, response_schema: Optional[dict]) -> dict:
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    if response_schema is not None:
+        # Constrained decoding: Gemini only emits JSON matching the schema
+        payload["generationConfig"] = {
+            "responseMimeType": "application/json",
+            "responseSchema": response_schema,
+        }
+    return payload
+
+
+def call_gemini(prompt: str, response_schema: Optional[dict] = None) -> str:
     """
     Low-level Gemini call. Returns raw text output. Auto-discovers a supported model
     and retries once on 404/not-supported errors. Falls back to generateText if needed.
+    429 and 5xx responses raise requests.HTTPError without the fallback.
+
+    response_schema (an OpenAPI-style Gemini Schema dict) requests JSON output
+    constrained to that schema; the generateText fallback ignores it.
     """
 
     if not GEMINI_API_KEY:
@@ -94,9 +119,7 @@ def call_gemini(prompt: str) -> str:
         url = f"{GEMINI_BASE}/{GEMINI_API_VERSION}/models/{model_name}:generateContent"
         resp = requests.post(
             f"{url}?key={GEMINI_API_KEY}",
-            json={
-                "contents": [{"parts": [{"text": prompt}]}]
-            },
+            json=_content_payload(prompt, response_schema),
             timeout=30,
         )
         return resp
@@ -125,8 +148,13 @@ def call_gemini(prompt: str) -> str:
         print(f"[Gemini] Retrying with model: {model}")
         resp = _generate_content(model)
 
-    # If still error, attempt generateText
-    if resp.status_code >= 400:
+    # Rate limits and server errors surface as-is so callers can retry them;
+    # generateText only helps when generateContent itself is unsupported
+    if resp.status_code == 429 or resp.status_code >= 500:
+        resp.raise_for_status()
+
+    # If still not supported, attempt generateText
+    if resp.status_code == 404 or (resp.status_code == 400 and "not supported" in resp.text.lower()):
         print(f"[Gemini] generateContent failed ({resp.status_code}). Trying generateText...")
         resp = _generate_text(model)
 
@@ -150,11 +178,40 @@ def call_gemini(prompt: str) -> str:
     return text
 
 
-def analyze_response(question: str, user_answer: str) -> dict:
+def call_gemini_stream(prompt: str, response_schema: Optional[dict] = None) -> Iterator[str]:
     """
-    Uses Gemini to analyze a user's answer and extract confidence signals.
+    Streaming variant of call_gemini. Yields text fragments as Gemini
+    produces them (streamGenerateContent over server-sent events), so
+    callers can start parsing long outputs before generation finishes.
     """
 
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+
+    model = _resolve_supported_model(GEMINI_MODEL)
+    url = f"{GEMINI_BASE}/{GEMINI_API_VERSION}/models/{model}:streamGenerateContent"
+    with requests.post(
+        url,
+        params={"alt": "sse", "key": GEMINI_API_KEY},
+        json=_content_payload(prompt, response_schema),
+        stream=True,
+        timeout=30,
+    ) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            for candidate in event.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+
+
+@llm_cache.cached(ttl=3600)
+def _gemini_analysis(question: str, user_answer: str) -> dict:
+    """Ask Gemini to score an answer. Raises on any failure."""
+
     prompt = f"""
 You are an expert educational evaluator.
 
@@ -181,16 +238,24 @@ Output ONLY valid JSON (no markdown):
 }}
 """
 
+    text = call_gemini(prompt)
+    text = _strip_markdown_fences(text)
+    result = json.loads(text)
+    # Validate required fields
+    required = ["clarity", "correctness", "confidence", "reasoning_quality", "short_feedback"]
+    if all(k in result for k in required):
+        return result
+    else:
+        raise ValueError("Missing required fields in Gemini response")
+
+
+def analyze_response(question: str, user_answer: str) -> dict:
+    """
+    Uses Gemini to analyze a user's answer and extract confidence signals.
+    """
+
     try:
-        text = call_gemini(prompt)
-        text = _strip_markdown_fences(text)
-        result = json.loads(text)
-        # Validate required fields
-        required = ["clarity", "correctness", "confidence", "reasoning_quality", "short_feedback"]
-        if all(k in result for k in required):
-            return result
-        else:
-            raise ValueError("Missing required fields in Gemini response")
+        return _gemini_analysis(question, user_answer)
     except Exception as e:
         print(f"Gemini analysis failed: {e}")
         # Fallback when API fails
@@ -0,0 +1,52 @@
+"""
+LLM response cache.
+
+Memoizes Gemini-backed helpers on a hash of their inputs so identical
+requests skip the model call. Only successful results are stored:
+decorate the function that raises on failure, not its fallback wrapper.
+"""
+import contextvars
+import copy
+import functools
+import hashlib
+import json
+from typing import Any, Callable
+
+from .cache import TTLCache
+
+_last_status: contextvars.ContextVar[str] = contextvars.ContextVar("llm_cache_status", default="MISS")
+
+
+def cache_key(name: str, *args: Any, **kwargs: Any) -> str:
+    """Stable SHA-256 key for a call to ``name`` with the given arguments."""
+    payload = json.dumps({"fn": name, "args": args, "kwargs": kwargs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached(ttl: float = 3600, maxsize: int = 512) -> Callable:
+    """Decorator caching a function's return value for ``ttl`` seconds."""
+
+    def decorator(fn: Callable) -> Callable:
+        store = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = cache_key(fn.__qualname__, *args, **kwargs)
+            hit = store.get(key)
+            if hit is not None:
+                _last_status.set("HIT")
+                return copy.deepcopy(hit)
+            _last_status.set("MISS")
+            result = fn(*args, **kwargs)
+            store.set(key, copy.deepcopy(result))
+            return result
+
+        wrapper.cache = store  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+def last_status() -> str:
+    """"HIT" or "MISS" for the most recent cached call in this context."""
+    return _last_status.get()
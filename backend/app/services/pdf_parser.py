@@ -4,11 +4,27 @@ PDF and text ingestion utilities.
 Responsible for extracting raw text from PDFs and producing
 topic/concept level chunks suitable for downstream processing.
 """
+import hashlib
+import io
+import json
+import logging
 import math
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Any, Tuple
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, List, Dict, Any, Optional, Tuple, Union
 
 from app.config import PROJECT_ID, DOC_AI_LOCATION, DOC_AI_PROCESSOR_ID
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdfium2 as pdfium  # PDFium bindings, much faster than PyPDF2
+except Exception:  # optional dependency
+    pdfium = None  # type: ignore
 
 try:
     from PyPDF2 import PdfReader  # lightweight PDF text extraction
@@ -20,34 +36,180 @@ try:
 except Exception:  # optional dependency
     documentai = None  # type: ignore
 
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+# Parse results keyed by a digest of their inputs. Values are stored as
+# JSON strings so every caller gets a fresh copy it may mutate.
+_parse_cache = TTLCache(maxsize=128)
+_summary_cache = TTLCache(maxsize=128)
+
+
+def _digest(*parts: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.digest()
+
+
+# Below this many pages the IPC cost of the process pool outweighs the speedup.
+PARALLEL_PAGE_THRESHOLD = 4
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    """
+    Prefer forkserver: forking the serving process directly would copy its
+    live gRPC channel and request threads into the children, a known source
+    of deadlocks. Platforms without it (Windows) keep their default, spawn.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared page-extraction pool, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=_pool_context())
+    return _process_pool
+
+
+def _extract_pages_parallel(data: bytes, page_count: int) -> str:
+    # Chunking lets pickle send the shared PDF bytes once per chunk
+    # rather than once per page.
+    chunksize = math.ceil(page_count / (os.cpu_count() or 1))
+    pool = _get_process_pool()
+    return "\n".join(
+        pool.map(_extract_page, [data] * page_count, range(page_count), chunksize=chunksize)
+    )
+
+
+def _extract_page(data: bytes, page_index: int) -> str:
+    """Worker: re-open the PDF in the child process and extract one page."""
+    reader = PdfReader(io.BytesIO(data))
+    return reader.pages[page_index].extract_text() or ""
+
 
-def extract_text_from_pdf_bytes(data: bytes) -> str:
-    """Extract plain text from a PDF given its bytes.
+# PDFium is not thread-safe; every call into it, from opening a document
+# to closing it, must hold this lock.
+_pdfium_lock = threading.Lock()
 
-    Returns empty string if PyPDF2 is unavailable or parsing fails.
+
+def _extract_text_pdfium(data: Union[bytes, IO[bytes]]) -> str:
+    with _pdfium_lock:
+        doc = pdfium.PdfDocument(data)
+        try:
+            parts: List[str] = []
+            for i in range(len(doc)):
+                page = doc[i]
+                textpage = page.get_textpage()
+                parts.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+        finally:
+            doc.close()
+    return "\n".join(parts)
+
+
+def extract_text_from_pdf_bytes(data: Union[bytes, IO[bytes]]) -> str:
+    """Extract plain text from a PDF given its bytes or a binary stream.
+
+    Uses pypdfium2 when installed, falling back to PyPDF2. Streams are
+    parsed in place rather than copied into memory first. On the PyPDF2
+    path pages are extracted in parallel across a process pool for larger
+    documents; small PDFs stay sequential.
+    Returns empty string if no PDF library is available or parsing fails.
     """
+    if pdfium is not None:
+        try:
+            return _extract_text_pdfium(data)
+        except Exception as e:
+            logger.warning("PDFium extraction failed, falling back to PyPDF2: %s", e)
+            if not isinstance(data, bytes):
+                data.seek(0)
+
     if PdfReader is None:
         return ""
     try:
-        import io
-        reader = PdfReader(io.BytesIO(data))
-        parts: List[str] = []
-        for page in reader.pages:
-            txt = page.extract_text() or ""
-            parts.append(txt)
-        return "\n".join(parts)
+        reader = PdfReader(io.BytesIO(data) if isinstance(data, bytes) else data)
+        page_count = len(reader.pages)
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            return "\n".join([page.extract_text() or "" for page in reader.pages])
+
+        # Worker processes need picklable bytes.
+        if not isinstance(data, bytes):
+            data.seek(0)
+            data = data.read()
+        try:
+            return _extract_pages_parallel(data, page_count)
+        except Exception as e:
+            # A pool that cannot start or has broken must not lose the text
+            logger.warning("Parallel PDF extraction failed, extracting sequentially: %s", e)
+            return "\n".join([page.extract_text() or "" for page in reader.pages])
     except Exception:
         return ""
 
 
-def extract_text_with_document_ai(pdf_bytes: bytes) -> str:
+def document_ai_configured() -> bool:
+    """True when Document AI is installed and a processor is configured."""
+    return documentai is not None and bool(PROJECT_ID and DOC_AI_PROCESSOR_ID)
+
+
+_docai_client = None
+_docai_name: Optional[str] = None
+_docai_lock = threading.Lock()
+
+# Keep the shared HTTP/2 channel warm between uploads; concurrent requests
+# from worker threads are multiplexed over it as separate streams.
+_DOCAI_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+def _create_docai_channel(host: str, **kwargs: Any):
+    transport_cls = documentai.DocumentProcessorServiceClient.get_transport_class("grpc")
+    kwargs["options"] = list(kwargs.get("options") or []) + _DOCAI_CHANNEL_OPTIONS
+    return transport_cls.create_channel(host, **kwargs)
+
+
+def _get_docai_client():
+    """Return the shared Document AI client and processor path.
+
+    Client construction runs auth discovery and gRPC channel setup, so it
+    is done once per process and reused across requests.
+    """
+    global _docai_client, _docai_name
     if documentai is None:
         raise RuntimeError("google-cloud-documentai is not installed")
     if not (PROJECT_ID and DOC_AI_PROCESSOR_ID):
         raise RuntimeError("Document AI configuration missing PROJECT_ID or PROCESSOR_ID")
 
-    client = documentai.DocumentProcessorServiceClient()
-    name = client.processor_path(PROJECT_ID, DOC_AI_LOCATION, DOC_AI_PROCESSOR_ID)
+    if _docai_client is None:
+        with _docai_lock:
+            if _docai_client is None:
+                # Regional processors must be called on their regional endpoint
+                transport_cls = documentai.DocumentProcessorServiceClient.get_transport_class("grpc")
+                transport = transport_cls(
+                    host=f"{DOC_AI_LOCATION}-documentai.googleapis.com",
+                    channel=_create_docai_channel,
+                )
+                client = documentai.DocumentProcessorServiceClient(transport=transport)
+                _docai_name = client.processor_path(PROJECT_ID, DOC_AI_LOCATION, DOC_AI_PROCESSOR_ID)
+                _docai_client = client
+    return _docai_client, _docai_name
+
+
+def extract_text_with_document_ai(pdf_bytes: bytes) -> str:
+    client, name = _get_docai_client()
     raw_document = documentai.RawDocument(content=pdf_bytes, mime_type="application/pdf")
     request = documentai.ProcessRequest(name=name, raw_document=raw_document)
     result = client.process_document(request=request)
@@ -55,26 +217,69 @@ def extract_text_with_document_ai(pdf_bytes: bytes) -> str:
     return doc.text or ""
 
 
-def extract_text_prefer_document_ai(pdf_bytes: bytes) -> Tuple[str, str]:
+def warm_up() -> None:
+    """Create the Document AI client and PDF worker processes ahead of time."""
+    if multiprocessing.parent_process() is not None:
+        # Pool workers import the app too; they must not build pools of their own
+        return
+    if document_ai_configured():
+        _get_docai_client()
+    # The process pool only backs the PyPDF2 path
+    if pdfium is None and PdfReader is not None:
+        workers = os.cpu_count() or 1
+        list(_get_process_pool().map(abs, range(workers)))
+
+
+def extract_text_prefer_document_ai(pdf: Union[bytes, IO[bytes]]) -> Tuple[str, str]:
     """Attempt Document AI first; fall back to PyPDF2.
 
+    When Document AI is not configured a stream is handed straight to
+    PyPDF2; only the Document AI request needs the whole file in memory.
     Returns tuple (text, source)
     """
-    if pdf_bytes:
+    if pdf and document_ai_configured():
+        if not isinstance(pdf, bytes):
+            pdf = pdf.read()
         try:
-            text = extract_text_with_document_ai(pdf_bytes)
+            text = extract_text_with_document_ai(pdf)
             if text:
                 return text, "document_ai"
         except Exception as e:
-            print(f"[DocumentAI] Falling back to PyPDF2: {e}")
+            logger.warning("Document AI extraction failed, falling back to PyPDF2: %s", e)
 
-    text = extract_text_from_pdf_bytes(pdf_bytes)
+    text = extract_text_from_pdf_bytes(pdf)
     return text, "pypdf2"
 
 
+def split_sentences(text: str) -> List[str]:
+    """Split text into stripped, non-empty sentences."""
+    return [s for s in _SENT_SPLIT.split(text.strip()) if s]
+
+
+def pick_key_points(sentences: List[str]) -> List[str]:
+    """Pick up to three substantial sentences from the start of a section."""
+    return [s for s in sentences[:5] if len(s) > 30][:3]
+
+
 def normalize_text(text: str) -> str:
-    """Basic cleanup: collapse whitespace and strip."""
-    return "\n".join(line.strip() for line in text.splitlines()).strip()
+    """Basic cleanup: strip every line and the document as a whole."""
+    # splitlines() also breaks on \x0c (PDF page breaks), \r, \u2028 etc.;
+    # a list lets join() skip materializing a generator
+    return "\n".join([line.strip() for line in text.splitlines()]).strip()
+
+
+MAX_HEADING_LEN = 80
+
+
+def _is_heading(line: str) -> bool:
+    if len(line) > MAX_HEADING_LEN:
+        return False
+    # Title Case heuristic: most words start uppercase
+    tokens = [t for t in line.split() if t.isalpha()]
+    if not tokens:
+        return False
+    upper_ratio = sum(1 for t in tokens if t[0].isupper()) / len(tokens)
+    return upper_ratio > 0.6
 
 
 def split_into_sections(text: str) -> List[Tuple[str, str]]:
@@ -84,23 +289,14 @@ def split_into_sections(text: str) -> List[Tuple[str, str]]:
     - Group subsequent lines as section content
     Returns list of (title, content).
     """
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    # Stripped non-empty lines; each line is stripped only once
+    lines = [s for l in text.splitlines() if (s := l.strip())]
     sections: List[Tuple[str, str]] = []
 
-    def is_heading(line: str) -> bool:
-        if len(line) > 80:
-            return False
-        # Title Case heuristic: most words start uppercase
-        tokens = [t for t in line.split() if t.isalpha()]
-        if not tokens:
-            return False
-        upper_ratio = sum(1 for t in tokens if t[0].isupper()) / len(tokens)
-        return upper_ratio > 0.6
-
     current_title = "Introduction"
     current_buf: List[str] = []
     for line in lines:
-        if is_heading(line):
+        if _is_heading(line):
             # flush previous
             if current_buf:
                 sections.append((current_title, " ".join(current_buf)))
@@ -123,11 +319,18 @@ def parse_document(text: str) -> Dict[str, Any]:
         "concepts": [{"title": str, "content": str}],
     }
     """
+    key = _digest(text)
+    cached = _parse_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
     clean = normalize_text(text)
     sections = split_into_sections(clean)
     topics = [title for title, _ in sections]
     concepts = [{"title": title, "content": content} for title, content in sections]
-    return {"topics": topics, "concepts": concepts}
+    result = {"topics": topics, "concepts": concepts}
+    _parse_cache.set(key, json.dumps(result))
+    return result
 
 
 def build_structured_summary(text: str, topics: List[str], concepts: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -135,8 +338,18 @@ def build_structured_summary(text: str, topics: List[str], concepts: List[Dict[s
 
     Fields: title, overview, key_concepts, main_topics, difficulty_level, estimated_read_time_minutes
     """
+    key = _digest(text, json.dumps([topics, concepts], sort_keys=True))
+    cached = _summary_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    summary = _build_structured_summary(text, topics, concepts)
+    _summary_cache.set(key, json.dumps(summary))
+    return summary
+
+
+def _build_structured_summary(text: str, topics: List[str], concepts: List[Dict[str, Any]]) -> Dict[str, Any]:
     clean = normalize_text(text)
-    sentences = [s for s in re.split(r"(?<=[.!?])\s+", clean) if s]
+    sentences = [s for s in _SENT_SPLIT.split(clean) if s]
     word_count = len(clean.split())
 
     # Overview: first few sentences capped for readability
@@ -162,13 +375,12 @@ def build_structured_summary(text: str, topics: List[str], concepts: List[Dict[s
         # Expand description to be more detailed (increased from 420 to 840 chars)
         description = desc_source[:840] if len(desc_source) > 200 else desc_source
         
-        # Extract key points from the content (simple sentence extraction)
-        key_points = []
-        content_text = concept.get("content", "")
-        if content_text:
-            # Split into sentences and take the most substantial ones
-            content_sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", content_text) if s.strip()]
-            key_points = [s for s in content_sentences[:5] if len(s) > 30][:3]
+        # Key points are precomputed by extract_concepts; derive them here
+        # only for concepts that come from elsewhere
+        key_points = concept.get("key_points")
+        if key_points is None:
+            content_text = concept.get("content", "")
+            key_points = pick_key_points(split_sentences(content_text)) if content_text else []
         
         main_topics.append({
             "name": concept.get("title", "Topic"),
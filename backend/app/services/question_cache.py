@@ -0,0 +1,91 @@
+"""
+Pre-generated question pool.
+
+Keeps up to POOL_MAX ready questions per (domain, topic, difficulty,
+segment) bucket so batch requests can be served without waiting on
+Gemini. Questions are popped, never re-served, and a bucket that runs
+low is topped up a few questions at a time in the background. Like the
+session store this lives in process memory, so each worker keeps its
+own pool.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+POOL_MAX = 20
+POOL_TTL_SECONDS = 24 * 3600
+# Start a background refill once a bucket holds fewer than this many questions
+REFILL_BELOW = 5
+# Questions generated per refill (one Gemini call), and refills running at once
+REFILL_SIZE = 3
+MAX_REFILLS_IN_FLIGHT = 2
+
+_pools: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+_refilling: Set[str] = set()
+_lock = threading.Lock()
+_refill_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-refill")
+
+
+def pool_key(domain: str, topic: str, difficulty: str, segment: Optional[str]) -> str:
+    return hashlib.sha256(f"{domain}|{topic}|{difficulty}|{segment}".encode("utf-8")).hexdigest()
+
+
+def get_question(key: str) -> Optional[Dict[str, Any]]:
+    """Pop a fresh question from the bucket, or None if it is empty."""
+    now = time.monotonic()
+    with _lock:
+        pool = _pools.get(key)
+        while pool:
+            expires_at, question = pool.popleft()
+            if expires_at >= now:
+                return question
+        return None
+
+
+def push_question(key: str, question: Dict[str, Any]) -> None:
+    """Add a question to the bucket, dropping the oldest beyond POOL_MAX."""
+    with _lock:
+        pool = _pools.setdefault(key, deque(maxlen=POOL_MAX))
+        pool.append((time.monotonic() + POOL_TTL_SECONDS, question))
+
+
+def size(key: str) -> int:
+    with _lock:
+        return len(_pools.get(key, ()))
+
+
+def schedule_refill(key: str, produce: Callable[[int], List[Optional[Dict[str, Any]]]]) -> bool:
+    """
+    Add up to REFILL_SIZE questions to the bucket in the background if it is low.
+
+    produce(n) should return up to n new questions (None entries are
+    skipped). At most one refill per bucket, and MAX_REFILLS_IN_FLIGHT
+    overall, run at a time; requests beyond that are dropped rather than
+    queued. Returns True if a refill was started.
+    """
+    with _lock:
+        if (key in _refilling or len(_refilling) >= MAX_REFILLS_IN_FLIGHT
+                or len(_pools.get(key, ())) >= REFILL_BELOW):
+            return False
+        _refilling.add(key)
+        missing = min(REFILL_SIZE, POOL_MAX - len(_pools.get(key, ())))
+
+    def refill():
+        try:
+            for question in produce(missing):
+                if question is not None:
+                    push_question(key, question)
+        except Exception as e:
+            logger.warning("Refill failed: %s", e)
+        finally:
+            with _lock:
+                _refilling.discard(key)
+
+    _refill_pool.submit(refill)
+    return True
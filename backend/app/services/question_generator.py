@@ -1,11 +1,331 @@
-from app.services.gemini_analyzer import call_gemini
+from app.services import question_cache
+from app.services.gemini_analyzer import GEMINI_MAX_CONCURRENCY, call_gemini, call_gemini_stream
 from app.services.question_validator import validate_and_fix_question
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, cycle, islice, repeat
+from json import JSONDecoder
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+from typing import Any, Iterable, Iterator, Optional
+import functools
+import logging
+import os
+import queue
 import re
 import uuid
 import random
+import requests
 import time
 
+try:
+    import orjson as _json  # optional dependency; faster parsing of Gemini responses
+except ImportError:
+    import json as _json
+
+logger = logging.getLogger(__name__)
+
+# Gemini attempts per batch slot before falling back to a canned question
+MAX_ATTEMPTS = 3
+
+# stdlib decoder for raw_decode(), which orjson has no equivalent of
+_DECODER = JSONDecoder()
+
+# Markdown code fences Gemini sometimes wraps around its JSON output
+_MD_JSON_OPEN = re.compile(r'^```json\s*', re.MULTILINE)
+_MD_JSON_CLOSE = re.compile(r'```\s*$', re.MULTILINE)
+
+
+def _short_seed() -> str:
+    """8 hex chars of randomness used to vary prompts (not an identifier)."""
+    return os.urandom(4).hex()
+
+
+# Prompt templates, filled with str.format_map() per call. Placeholders:
+# domain, topic, unique_seed, timestamp, random_variation,
+# selected_perspective, selected_style.
+EASY_TMPL = """
+Assessment designer for {domain}. id={unique_seed} ts={timestamp} v={random_variation}
+Write ONE new EASY MCQ on {topic}; never repeat earlier questions. Angle: {selected_perspective}; {selected_style}.
+- Definitions/terminology only ("What is...", "Which of the following...", "Define..."); no scenarios or analysis
+- Exactly 4 options A-D, one correct
+Return only JSON:
+{{"question": "...", "options": ["A) ...", "B) ...", "C) ...", "D) ..."], "correct_answer": "A", "topic": "{topic}", "difficulty": "easy"}}
+"""
+
+MODERATE_TMPL = """
+Assessment designer for {domain}. id={unique_seed} ts={timestamp} v={random_variation}
+Write ONE new MODERATE MCQ on {topic}; never repeat earlier questions. Angle: {selected_perspective}; {selected_style}.
+- Apply the concept in a real-world scenario ("How would...", "Why does...", "When would you..."); no pure definitions
+- Exactly 4 options A-D, one correct, solvable by elimination
+Return only JSON:
+{{"question": "...", "options": ["A) ...", "B) ...", "C) ...", "D) ..."], "correct_answer": "B", "topic": "{topic}", "difficulty": "moderate"}}
+"""
+
+HARD_MCQR_TMPL = """
+Assessment designer for {domain}. id={unique_seed} ts={timestamp} v={random_variation}
+Write ONE new HARD MCQ needing multi-step reasoning on {topic}; never repeat earlier questions. Angle: {selected_perspective}; {selected_style}.
+- Interview level; answerable only by deep logical deduction
+- Exactly 4 options A-D, one correct
+Return only JSON:
+{{"question": "...", "options": ["A) ...", "B) ...", "C) ...", "D) ..."], "correct_answer": "C", "reasoning_explanation": "why correct, why others wrong", "topic": "{topic}", "difficulty": "hard"}}
+"""
+
+HARD_AR_TMPL = """
+Assessment designer for {domain}. id={unique_seed} ts={timestamp} v={random_variation}
+Write ONE new HARD assertion-reasoning question on {topic}, case-based; never repeat earlier questions. Angle: {selected_perspective}; {selected_style}.
+Return only JSON, options verbatim:
+{{"assertion": "Assertion (A): ...", "reason": "Reason (R): ...", "options": ["A) Both A and R are true, and R is the correct explanation of A", "B) Both A and R are true, but R is NOT the correct explanation of A", "C) A is true, but R is false", "D) A is false, but R is true"], "correct_answer": "A", "topic": "{topic}", "difficulty": "hard"}}
+"""
+
+FALLBACK_TMPL = """
+Generate a moderate difficulty MCQ about {topic} in {domain} with exactly 4 options.
+"""
+
+# Gemini response schemas (OpenAPI subset) for constrained JSON decoding
+_OPTIONS_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}, "minItems": 4, "maxItems": 4}
+_ANSWER_SCHEMA = {"type": "STRING", "enum": ["A", "B", "C", "D"]}
+
+MCQ_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "options": _OPTIONS_SCHEMA,
+        "correct_answer": _ANSWER_SCHEMA,
+        "topic": {"type": "STRING"},
+        "difficulty": {"type": "STRING"},
+    },
+    "required": ["question", "options", "correct_answer"],
+}
+
+MCQ_REASONING_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        **MCQ_SCHEMA["properties"],
+        "reasoning_explanation": {"type": "STRING"},
+    },
+    "required": ["question", "options", "correct_answer", "reasoning_explanation"],
+}
+
+ASSERTION_REASON_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "assertion": {"type": "STRING"},
+        "reason": {"type": "STRING"},
+        "options": _OPTIONS_SCHEMA,
+        "correct_answer": _ANSWER_SCHEMA,
+        "topic": {"type": "STRING"},
+        "difficulty": {"type": "STRING"},
+    },
+    "required": ["assertion", "reason", "options", "correct_answer"],
+}
+
+# Single-call batches mix formats, so item fields beyond these are optional
+BATCH_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "questions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "index": {"type": "INTEGER"},
+                    **MCQ_REASONING_SCHEMA["properties"],
+                    "assertion": {"type": "STRING"},
+                    "reason": {"type": "STRING"},
+                },
+                "required": ["index", "options", "correct_answer"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+_SCHEMAS = {
+    "MCQ": MCQ_SCHEMA,
+    "MCQ_REASONING": MCQ_REASONING_SCHEMA,
+    "ASSERTION_REASON": ASSERTION_REASON_SCHEMA,
+}
+
+_TEMPLATES = {
+    ("easy", "MCQ"): EASY_TMPL,
+    ("moderate", "MCQ"): MODERATE_TMPL,
+    ("hard", "MCQ_REASONING"): HARD_MCQR_TMPL,
+    ("hard", "ASSERTION_REASON"): HARD_AR_TMPL,
+}
+
+
+# Topic pools per domain
+_DOMAIN_TOPICS: dict[str, tuple[str, ...]] = {
+    "machine-learning": (
+        "Supervised Learning", "Unsupervised Learning", "Neural Networks",
+        "Model Evaluation", "Overfitting & Regularization", "Feature Engineering",
+        "Ensemble Methods", "Deep Learning", "Transfer Learning", "Model Deployment"
+    ),
+    "data-science": (
+        "Data Preprocessing", "Statistical Analysis", "Data Visualization",
+        "Hypothesis Testing", "Regression Analysis", "Classification",
+        "Clustering", "Time Series Analysis", "A/B Testing", "ETL Pipelines"
+    ),
+    "operating-systems": (
+        "Process Management", "Memory Management", "File Systems",
+        "Concurrency", "Deadlocks", "Scheduling Algorithms",
+        "Virtual Memory", "I/O Management", "System Calls", "Synchronization"
+    ),
+    "web-development": (
+        "HTTP Protocol", "RESTful APIs", "Frontend Frameworks",
+        "Backend Architecture", "Database Design", "Authentication",
+        "State Management", "Responsive Design", "Performance Optimization", "Security"
+    ),
+    "computer-networks": (
+        "OSI Model", "TCP/IP Protocol", "Routing Algorithms",
+        "Network Security", "DNS", "Load Balancing",
+        "Network Topologies", "Firewalls", "VPN", "Quality of Service"
+    ),
+}
+
+# Difficulty mix for a "moderate" batch, skewed toward moderate
+_MODERATE_MIX = (
+    "easy", "moderate", "moderate", "moderate", "hard",
+    "moderate", "moderate", "hard", "moderate", "moderate",
+)
+
+# Varied aspects/subtopics for custom domains; formatted with the domain
+_CUSTOM_ANGLES = (
+    "{domain} - Fundamentals",
+    "{domain} - Architecture & Design",
+    "{domain} - Implementation Strategies",
+    "{domain} - Best Practices",
+    "{domain} - Common Challenges",
+    "{domain} - Performance & Optimization",
+    "{domain} - Security Considerations",
+    "{domain} - Real-World Applications",
+    "{domain} - Advanced Concepts",
+    "{domain} - Industry Standards",
+)
+
+# Random perspective/focus to ensure different questions each time
+_PERSPECTIVES = (
+    "practical application perspective",
+    "theoretical understanding angle",
+    "real-world scenario context",
+    "industry best practices focus",
+    "edge case and limitations view",
+    "comparative analysis approach",
+    "problem-solving methodology",
+    "design trade-offs consideration",
+)
+
+# Random question style variation
+_STYLES = (
+    "Focus on WHY and HOW aspects",
+    "Emphasize WHEN and WHERE scenarios",
+    "Explore trade-offs and comparisons",
+    "Test critical thinking and analysis",
+    "Challenge common misconceptions",
+    "Evaluate decision-making criteria",
+)
+
+# Fallback question pools used when Gemini fails; formatted with topic and domain
+_FALLBACK_STARTERS = (
+    "How does {topic} improve system performance in {domain}?",
+    "Which scenario best demonstrates the application of {topic}?",
+    "In {domain}, when would you choose {topic} over alternative approaches?",
+    "Explain the relationship between {topic} and real-world {domain} implementations.",
+    "Which factor is most critical when implementing {topic} in {domain}?",
+    "Compare the advantages of using {topic} in different {domain} contexts.",
+    "Identify the key characteristic that defines {topic} in {domain}.",
+    "What trade-off is associated with applying {topic} in {domain} systems?",
+)
+
+_FALLBACK_OPTIONS_SETS = (
+    (
+        "A) It optimizes resource allocation",
+        "B) It enhances system modularity",
+        "C) It improves maintainability",
+        "D) It reduces computational complexity"
+    ),
+    (
+        "A) When scalability is the primary concern",
+        "B) When performance optimization is needed",
+        "C) When maintainability outweighs efficiency",
+        "D) When security is the top priority"
+    ),
+    (
+        "A) High throughput with moderate latency",
+        "B) Low latency with variable throughput",
+        "C) Balanced performance across metrics",
+        "D) Maximum reliability with minimal overhead"
+    ),
+    (
+        "A) It provides a structured approach to problem decomposition",
+        "B) It enables parallel processing capabilities",
+        "C) It simplifies error handling mechanisms",
+        "D) It facilitates rapid prototyping"
+    ),
+)
+
+_ASSERTION_STARTERS = (
+    "{topic} is essential for achieving optimal performance in {domain}.",
+    "Implementing {topic} requires understanding of underlying system constraints in {domain}.",
+    "The effectiveness of {topic} depends on proper context evaluation in {domain}.",
+    "Mastery of {topic} directly correlates with system reliability in {domain}.",
+)
+
+_REASON_STARTERS = (
+    "It provides a systematic framework for addressing complex challenges.",
+    "It enables predictable behavior under varying conditions.",
+    "It establishes clear boundaries for system operation.",
+    "It facilitates efficient resource management and allocation.",
+)
+
+_ASSERTION_REASON_OPTIONS = (
+    "A) Both A and R are true, and R is the correct explanation of A",
+    "B) Both A and R are true, but R is NOT the correct explanation of A",
+    "C) A is true, but R is false",
+    "D) A is false, but R is true",
+)
+
+_HARD_QUESTIONS = (
+    "Analyze the trade-offs involved when implementing {topic} in {domain}. Which factor is most critical?",
+    "In a resource-constrained {domain} environment, how would {topic} impact system design decisions?",
+    "Evaluate the implications of choosing {topic} over alternative approaches in {domain}. What is the primary consideration?",
+    "When optimizing for both performance and maintainability in {domain}, how does {topic} influence the balance?",
+)
+
+_HARD_OPTIONS_SETS = (
+    (
+        "A) Performance optimization takes precedence",
+        "B) Resource allocation constraints dominate",
+        "C) Contextual requirements drive the decision",
+        "D) Scalability concerns override other factors"
+    ),
+    (
+        "A) Minimizing latency while maintaining throughput",
+        "B) Balancing complexity with maintainability",
+        "C) Ensuring reliability without excessive overhead",
+        "D) Achieving modularity while preserving efficiency"
+    ),
+    (
+        "A) System architecture compatibility",
+        "B) Development team expertise",
+        "C) Long-term maintenance costs",
+        "D) Immediate performance gains"
+    ),
+)
+
+# Every assertion/reason pairing, so one random.choice picks both
+_ASSERTION_REASON_QUESTIONS = tuple(
+    f"Assertion (A): {assertion}\n\nReason (R): {reason}"
+    for assertion in _ASSERTION_STARTERS
+    for reason in _REASON_STARTERS
+)
+
+# segment -> (question templates, option sets, possible correct answers)
+_FALLBACK_POOLS = {
+    "MCQ": (_FALLBACK_STARTERS, _FALLBACK_OPTIONS_SETS, "ABCD"),
+    "MCQ_REASONING": (_HARD_QUESTIONS, _HARD_OPTIONS_SETS, "ABCD"),
+    "ASSERTION_REASON": (_ASSERTION_REASON_QUESTIONS, (_ASSERTION_REASON_OPTIONS,), "AB"),
+}
+
 
 def generate_question(subject: str, topic: str, difficulty: str = "medium") -> dict:
     """
@@ -15,7 +335,7 @@ def generate_question(subject: str, topic: str, difficulty: str = "medium") -> d
     
     # Add dynamic context to ensure fresh generation
     timestamp = int(time.time() * 1000)
-    unique_seed = str(uuid.uuid4())[:8]
+    unique_seed = _short_seed()
 
     prompt = f"""
 You are an expert educational assessment designer specializing in {subject}.
@@ -43,29 +363,27 @@ Output ONLY valid JSON (no markdown, no extra text):
 """
 
     try:
-        import traceback
         text = call_gemini(prompt)
-        print(f"[DEBUG] Gemini raw response: {text[:200]}")
+        logger.debug("Gemini raw response: %s", text[:200])
         
         # Strip markdown code blocks if present
-        text = re.sub(r'^```json\s*', '', text, flags=re.MULTILINE)
-        text = re.sub(r'```\s*$', '', text, flags=re.MULTILINE)
+        text = _MD_JSON_OPEN.sub('', text)
+        text = _MD_JSON_CLOSE.sub('', text)
         text = text.strip()
         
-        data = json.loads(text)
+        data = _json.loads(text)
         question_text = data.get("question", "").strip()
         
         if not question_text:
             raise ValueError("Empty question from Gemini")
         
-        print(f"[SUCCESS] Generated question: {question_text[:100]}")
+        logger.debug("Generated question: %s", question_text[:100])
         return {
             "question": question_text,
             "difficulty": data.get("difficulty", difficulty),
         }
     except Exception as e:
-        print(f"[ERROR] Gemini question generation failed: {e}")
-        traceback.print_exc()
+        logger.exception("Gemini question generation failed: %s", e)
         # Fallback only when Gemini completely fails
         return {
             "question": f"Explain the key principles of {topic} in {subject} and provide a real-world example demonstrating your understanding.",
@@ -73,7 +391,96 @@ Output ONLY valid JSON (no markdown, no extra text):
         }
 
 
-def generate_question_with_answer(domain: str, topic: str, difficulty: str = "moderate", segment: str = None) -> dict:
+# (difficulty, batch segment) -> question format; hard without a segment gets MCQ_REASONING
+_SEGMENT_TYPES = {
+    ("hard", "A"): "MCQ_REASONING",
+    ("hard", "B"): "ASSERTION_REASON",
+}
+
+
+def _segment_type(difficulty: str, segment: Optional[str] = None) -> str:
+    """Map a difficulty and batch segment ("A"/"B") to the question format."""
+    return _SEGMENT_TYPES.get((difficulty, segment), "MCQ_REASONING" if difficulty == "hard" else "MCQ")
+
+
+def _shape_question(data: dict, topic: str, difficulty: str, segment_type: str) -> dict:
+    """Turn a parsed Gemini payload into the API question shape.
+
+    Raises ValueError when required fields are missing.
+    """
+    # Validate and structure response based on segment type
+    if segment_type == "ASSERTION_REASON":
+        # Assertion-Reasoning format
+        assertion = data.get("assertion", "").strip()
+        reason = data.get("reason", "").strip()
+        options = data.get("options", [])
+
+        # Validation
+        if not assertion or not reason:
+            raise ValueError("Missing assertion or reason")
+        if len(options) != 4:
+            raise ValueError(f"Expected 4 options, got {len(options)}")
+
+        # Build combined question text
+        question_text = f"{assertion}\n\n{reason}"
+
+        return {
+            "question_id": str(uuid.uuid4()),
+            "question": question_text,
+            "options": options,
+            "correct_answer": data.get("correct_answer", "A").strip(),
+            "topic": data.get("topic", topic),
+            "difficulty": difficulty,
+            "segment": segment_type,
+            "reasoning_required": False,  # No additional reasoning for A-R type
+        }
+
+    else:
+        # MCQ or MCQ_REASONING format
+        question_text = data.get("question", "").strip()
+        options = data.get("options", [])
+
+        # Validation
+        if not question_text:
+            raise ValueError("Empty question text")
+        if len(options) != 4:
+            raise ValueError(f"Expected 4 options, got {len(options)}")
+
+        return {
+            "question_id": str(uuid.uuid4()),
+            "question": question_text,
+            "options": options,
+            "correct_answer": data.get("correct_answer", "A").strip(),
+            "topic": data.get("topic", topic),
+            "difficulty": difficulty,
+            "segment": segment_type,
+            "reasoning_required": (segment_type == "MCQ_REASONING"),
+        }
+
+
+def _build_fallback(topic: str, domain: str, difficulty: str, segment_type: str) -> dict:
+    """Canned, randomly varied question used when Gemini generation fails."""
+    # Strict fallback based on difficulty
+    if difficulty in ("easy", "moderate"):
+        segment = "MCQ"
+    else:
+        difficulty = "hard"
+        segment = "ASSERTION_REASON" if segment_type == "ASSERTION_REASON" else "MCQ_REASONING"
+
+    questions, option_sets, answers = _FALLBACK_POOLS[segment]
+    return {
+        "question_id": str(uuid.uuid4()),
+        "question": random.choice(questions).format(topic=topic, domain=domain),
+        "options": list(random.choice(option_sets)),
+        "correct_answer": random.choice(answers),
+        "topic": topic,
+        "difficulty": difficulty,
+        "segment": segment,
+        "reasoning_required": segment == "MCQ_REASONING",
+    }
+
+
+def generate_question_with_answer(domain: str, topic: str, difficulty: str = "moderate", segment: Optional[str] = None) -> dict:
     """
     Generate a complete question with STRICT format enforcement.
     
@@ -85,531 +492,402 @@ def generate_question_with_answer(domain: str, topic: str, difficulty: str = "mo
     
     Returns dict with: question_id, question, options, correct_answer, topic, difficulty, segment, reasoning_required
     """
+    try:
+        return _generate_question(domain, topic, difficulty, segment)
+    except Exception as e:
+        logger.exception("Question generation failed: %s", e)
+        return _build_fallback(topic, domain, difficulty, _segment_type(difficulty, segment))
+
+
+def _generate_question(domain: str, topic: str, difficulty: str, segment: Optional[str] = None) -> dict:
+    """generate_question_with_answer without the fallback: raises on any failure."""
     
     # Add dynamic context to prevent repetition
     timestamp = int(time.time() * 1000)
-    unique_seed = str(uuid.uuid4())[:8]
+    unique_seed = _short_seed()
     random_variation = random.randint(1000, 9999)
     
-    # Add random perspective/focus to ensure different questions each time
-    perspectives = [
-        "practical application perspective",
-        "theoretical understanding angle",
-        "real-world scenario context",
-        "industry best practices focus",
-        "edge case and limitations view",
-        "comparative analysis approach",
-        "problem-solving methodology",
-        "design trade-offs consideration"
-    ]
-    selected_perspective = random.choice(perspectives)
+    selected_perspective = random.choice(_PERSPECTIVES)
+    selected_style = random.choice(_STYLES)
     
-    # Add random question style variation
-    style_variations = [
-        "Focus on WHY and HOW aspects",
-        "Emphasize WHEN and WHERE scenarios",
-        "Explore trade-offs and comparisons",
-        "Test critical thinking and analysis",
-        "Challenge common misconceptions",
-        "Evaluate decision-making criteria"
-    ]
-    selected_style = random.choice(style_variations)
+    segment_type = _segment_type(difficulty, segment)
     
-    # Determine segment type for Hard difficulty
-    if difficulty == "hard":
-        if segment == "A":
-            segment_type = "MCQ_REASONING"
-        elif segment == "B":
-            segment_type = "ASSERTION_REASON"
-        else:
-            # Default to alternating if not specified
-            segment_type = "MCQ_REASONING"
-    elif difficulty == "moderate":
-        segment_type = "MCQ"
-    else:  # easy
+    # Pick the difficulty-specific prompt; anything unknown falls back to moderate
+    template = _TEMPLATES.get((difficulty, segment_type))
+    if template is None:
         segment_type = "MCQ"
+        template = FALLBACK_TMPL
+    prompt = template.format_map({
+        "domain": domain,
+        "topic": topic,
+        "unique_seed": unique_seed,
+        "timestamp": timestamp,
+        "random_variation": random_variation,
+        "selected_perspective": selected_perspective,
+        "selected_style": selected_style,
+    })
+
+    text = call_gemini(prompt, response_schema=_SCHEMAS[segment_type])
+    # Schema-constrained output is plain JSON; fences can still appear if
+    # call_gemini had to fall back to generateText
+    text = _MD_JSON_OPEN.sub('', text)
+    text = _MD_JSON_CLOSE.sub('', text)
+    data = _json.loads(text.strip())
+    return _shape_question(data, topic, difficulty, segment_type)
+
+
+def _plan_batch(domain: str, count: int, difficulty: str) -> list:
+    """Pick the (topic, difficulty, segment) slot for each question in a batch."""
+    count = max(0, count)
+
+    topics = _DOMAIN_TOPICS.get(domain)
+    if topics is None:
+        # For custom domains (not in predefined list), create varied topic angles
+        topics = [angle.format(domain=domain) for angle in _CUSTOM_ANGLES]
     
-    # Build difficulty-specific prompt instructions
+    # Sample topics without replacement to ensure different subtopic selection each time;
+    # once every topic is used, fill the remaining slots at random
+    if count <= len(topics):
+        selected_topics = random.sample(topics, count)
+    else:
+        selected_topics = random.sample(topics, len(topics)) + random.choices(topics, k=count - len(topics))
+
+    # Set difficulty distribution based on user's chosen level
     if difficulty == "easy":
-        prompt = f"""
-You are an expert educational assessment designer for {domain}.
+        difficulties = ["easy"] * count
+        segments = [None] * count
+    elif difficulty == "hard":
+        # Alternate between segment A and B for hard difficulty
+        difficulties = ["hard"] * count
+        segments = list(islice(cycle(("A", "B")), count))
+    else:  # moderate
+        # Mix of difficulties skewed toward moderate; extra slots beyond the mix are moderate
+        difficulties = list(islice(chain(_MODERATE_MIX, repeat("moderate")), count))
+        segments = [None] * count
 
-CRITICAL - UNIQUENESS REQUIREMENT (Assessment ID: {unique_seed}, Timestamp: {timestamp}, Variation: {random_variation}):
-This is a FRESH assessment attempt. You MUST generate a COMPLETELY NEW and UNIQUE question.
-DO NOT repeat, rephrase, or recycle ANY previously generated questions.
-Use {selected_perspective} to create a fresh angle on {topic}.
-{selected_style}.
+    return list(zip(selected_topics, difficulties, segments))
 
-Generate ONE EASY multiple-choice question about: {topic}
 
-STRICT REQUIREMENTS:
-- Format: Multiple Choice Question (MCQ) ONLY
-- Test surface-level understanding (definitions, basic concepts, terminology)
-- Question style: "What is...", "Which of the following...", "Define..."
-- Provide EXACTLY 4 options labeled A, B, C, D
-- Single correct answer
-- NO reasoning required
-- NO application scenarios
-- NO complex analysis
+def _fallback_batch_question(domain: str, topic: str, diff: str, segment: Optional[str] = None) -> dict:
+    return {
+        "question_id": str(uuid.uuid4()),
+        "question": f"Explain the key concepts of {topic} in {domain}.",
+        "options": ["A) Option 1", "B) Option 2", "C) Option 3", "D) Option 4"],
+        "correct_answer": "A",
+        "topic": topic,
+        "difficulty": diff,
+        "segment": "MCQ" if diff != "hard" else ("MCQ_REASONING" if segment == "A" else "ASSERTION_REASON"),
+        "reasoning_required": (diff == "hard" and segment == "A"),
+    }
 
-Output ONLY valid JSON (no markdown, no code blocks):
-{{
-  "question": "your MCQ question text here",
-  "options": ["A) option 1", "B) option 2", "C) option 3", "D) option 4"],
-  "correct_answer": "A",
-  "topic": "{topic}",
-  "difficulty": "easy"
-}}
-"""
-    
-    elif difficulty == "moderate":
-        prompt = f"""
-You are an expert educational assessment designer for {domain}.
 
-CRITICAL - UNIQUENESS REQUIREMENT (Assessment ID: {unique_seed}, Timestamp: {timestamp}, Variation: {random_variation}):
-This is a FRESH assessment attempt. You MUST generate a COMPLETELY NEW and UNIQUE question.
-DO NOT repeat, rephrase, or recycle ANY previously generated questions.
-Use {selected_perspective} to create a fresh angle on {topic}.
-{selected_style}.
-
-Generate ONE MODERATE multiple-choice question about: {topic}
-
-STRICT REQUIREMENTS:
-- Format: Multiple Choice Question (MCQ) ONLY
-- Test application + understanding of concepts
-- Include real-world context or practical scenarios
-- Question style: "How would...", "Why does...", "When would you..."
-- Provide EXACTLY 4 options labeled A, B, C, D
-- Single correct answer
-- Requires logical elimination and domain application
-- More difficult than basic concept recall
-- NO pure definition questions
+class _InvalidQuestion(Exception):
+    """A generated question failed validation; carries the auto-fixed version."""
 
-Output ONLY valid JSON (no markdown, no code blocks):
-{{
-  "question": "your MCQ question text here",
-  "options": ["A) option 1", "B) option 2", "C) option 3", "D) option 4"],
-  "correct_answer": "B",
-  "topic": "{topic}",
-  "difficulty": "moderate"
-}}
-"""
-    
-    elif difficulty == "hard" and segment_type == "MCQ_REASONING":
-        # HARD - SEGMENT 1: MCQ + Reasoning
-        prompt = f"""
-You are an expert educational assessment designer for {domain}.
+    def __init__(self, question: dict, error: str):
+        super().__init__(error)
+        self.question = question
 
-CRITICAL - UNIQUENESS REQUIREMENT (Assessment ID: {unique_seed}, Timestamp: {timestamp}, Variation: {random_variation}):
-This is a FRESH assessment attempt. You MUST generate a COMPLETELY NEW and UNIQUE question.
-DO NOT repeat, rephrase, or recycle ANY previously generated questions.
-Use {selected_perspective} to create a fresh angle on {topic}.
-{selected_style}.
 
-Generate ONE HARD multiple-choice question with reasoning requirement about: {topic}
+def _is_transient(exc: BaseException) -> bool:
+    """
+    Worth another attempt: rate limits, server errors and network blips,
+    plus unparseable or invalid model output (each retry builds a fresh
+    prompt with a new seed and angle). Auth errors, other 4xx and missing
+    configuration fail fast.
+    """
+    if isinstance(exc, requests.HTTPError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout, ValueError, _InvalidQuestion))
 
-STRICT REQUIREMENTS - SEGMENT 1 (MCQ + REASONING):
-- Format: Multiple Choice Question with MANDATORY reasoning explanation
-- Test complex objective reasoning
-- Require multi-step logical thinking
-- Interview-level difficulty
-- Provide EXACTLY 4 options labeled A, B, C, D
-- Single correct answer
-- User MUST provide reasoning explanation in addition to selecting option
-- Question should be answerable only with deep logical deduction
 
-Output ONLY valid JSON (no markdown, no code blocks):
-{{
-  "question": "your complex MCQ question text here",
-  "options": ["A) option 1", "B) option 2", "C) option 3", "D) option 4"],
-  "correct_answer": "C",
-  "reasoning_explanation": "Brief explanation of why this is correct and why others are wrong",
-  "topic": "{topic}",
-  "difficulty": "hard"
-}}
-"""
-    
-    elif difficulty == "hard" and segment_type == "ASSERTION_REASON":
-        # HARD - SEGMENT 2: Assertion-Reasoning
-        prompt = f"""
+def _log_retry(retry_state) -> None:
+    logger.info(
+        "Retrying question (attempt %d/%d failed): %s",
+        retry_state.attempt_number, MAX_ATTEMPTS, retry_state.outcome.exception(),
+    )
+
+
+@retry(
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=1, max=10),
+    retry=retry_if_exception(_is_transient),
+    before_sleep=_log_retry,
+    reraise=True,
+)
+def _generate_validated(domain: str, topic: str, diff: str, segment: Optional[str] = None) -> dict:
+    question = _generate_question(domain, topic, diff, segment)
+    # Validate and auto-fix the question
+    is_valid, fixed_question, error = validate_and_fix_question(question)
+    if not is_valid:
+        raise _InvalidQuestion(fixed_question, error)
+    return fixed_question
+
+
+def _generate_with_retries(domain: str, topic: str, diff: str, segment: Optional[str] = None) -> dict:
+    """Generate and validate one batch question, with backoff between attempts."""
+    try:
+        question = _generate_validated(domain, topic, diff, segment)
+        logger.debug("Generated: %s (difficulty=%s, segment=%s)", topic, diff, question.get("segment"))
+        return question
+    except _InvalidQuestion as e:
+        # Use the fixed version anyway after the last attempt
+        logger.warning("Using auto-fixed question despite validation warning: %s", e)
+        return e.question
+    except Exception as e:
+        logger.warning("Using fallback question for %s: %s", topic, e)
+        return _build_fallback(topic, domain, diff, _segment_type(diff, segment))
+
+
+
+# Slots per single-call batch request; keeps each response well within
+# Gemini's output token limit.
+BATCH_CALL_SIZE = 10
+
+_FORMAT_RULES = {
+    ("easy", "MCQ"): "EASY MCQ: surface-level definitions/terminology (\"What is...\", \"Which of the following...\", \"Define...\"); no scenarios",
+    ("moderate", "MCQ"): "MODERATE MCQ: application in a real-world scenario (\"How would...\", \"Why does...\", \"When would you...\"); no pure definitions",
+    ("hard", "MCQ_REASONING"): "HARD MCQ_REASONING: interview-level, multi-step reasoning; also return \"reasoning_explanation\"",
+    ("hard", "ASSERTION_REASON"): "HARD ASSERTION_REASON: return \"assertion\" (\"Assertion (A): ...\") and \"reason\" (\"Reason (R): ...\") instead of \"question\"",
+}
+
+
+def _batch_prompt(domain: str, specs: list, segment_types: list) -> str:
+    timestamp = int(time.time() * 1000)
+    unique_seed = _short_seed()
+
+    items = "\n".join(
+        f"{i}. topic: {spec['topic']} | format: "
+        f"{_FORMAT_RULES.get((spec['difficulty'], seg), _FORMAT_RULES[('moderate', 'MCQ')])}"
+        for i, (spec, seg) in enumerate(zip(specs, segment_types), start=1)
+    )
+    return f"""
 You are an expert educational assessment designer for {domain}.
 
-CRITICAL - UNIQUENESS REQUIREMENT (Assessment ID: {unique_seed}, Timestamp: {timestamp}, Variation: {random_variation}):
-This is a FRESH assessment attempt. You MUST generate a COMPLETELY NEW and UNIQUE question.
-DO NOT repeat, rephrase, or recycle ANY previously generated questions.
-Use {selected_perspective} to create a fresh angle on {topic}.
-{selected_style}.
-
-Generate ONE HARD assertion-reasoning question about: {topic}
-
-STRICT REQUIREMENTS - SEGMENT 2 (ASSERTION-REASONING):
-- Format: Assertion-Reasoning type question
-- Provide two statements:
-  - Assertion (A): A statement about the concept
-  - Reason (R): A reasoning or explanation statement
-- Test logical relationships and conceptual correctness
-- Use case-based or hypothetical scenarios
-- Provide EXACTLY 4 standard options:
-  A) Both A and R are true, and R is the correct explanation of A
-  B) Both A and R are true, but R is NOT the correct explanation of A
-  C) A is true, but R is false
-  D) A is false, but R is true
-- Single correct answer
-- Test logical dependency and concept validation
+Batch ID: {unique_seed}, Timestamp: {timestamp}. Generate {len(specs)} NEW, UNIQUE questions, one per numbered item below. Every question must take a different angle; never repeat or rephrase a question.
+
+Items:
+{items}
+
+Rules for every item:
+- EXACTLY 4 options labeled "A) ", "B) ", "C) ", "D) " and a single correct answer letter
+- ASSERTION_REASON items use exactly these options:
+  "A) Both A and R are true, and R is the correct explanation of A",
+  "B) Both A and R are true, but R is NOT the correct explanation of A",
+  "C) A is true, but R is false",
+  "D) A is false, but R is true"
 
 Output ONLY valid JSON (no markdown, no code blocks):
 {{
-  "assertion": "Assertion (A): statement about concept",
-  "reason": "Reason (R): explanation or reasoning statement",
-  "options": [
-    "A) Both A and R are true, and R is the correct explanation of A",
-    "B) Both A and R are true, but R is NOT the correct explanation of A",
-    "C) A is true, but R is false",
-    "D) A is false, but R is true"
-  ],
-  "correct_answer": "A",
-  "topic": "{topic}",
-  "difficulty": "hard"
+  "questions": [
+    {{"index": 1, "question": "...", "options": ["A) ...", "B) ...", "C) ...", "D) ..."], "correct_answer": "A", "topic": "..."}}
+  ]
 }}
 """
-    
-    else:
-        # Fallback to moderate
-        segment_type = "MCQ"
-        prompt = f"""
-Generate a moderate difficulty MCQ about {topic} in {domain} with exactly 4 options.
-"""
-    
-    try:
-        text = call_gemini(prompt)
-        text = re.sub(r'^```json\s*', '', text, flags=re.MULTILINE)
-        text = re.sub(r'```\s*$', '', text, flags=re.MULTILINE)
-        text = text.strip()
-        
-        data = json.loads(text)
-        
-        # Validate and structure response based on segment type
-        if segment_type == "ASSERTION_REASON":
-            # Assertion-Reasoning format
-            assertion = data.get("assertion", "").strip()
-            reason = data.get("reason", "").strip()
-            options = data.get("options", [])
-            
-            # Validation
-            if not assertion or not reason:
-                raise ValueError("Missing assertion or reason")
-            if len(options) != 4:
-                raise ValueError(f"Expected 4 options, got {len(options)}")
-            
-            # Build combined question text
-            question_text = f"{assertion}\n\n{reason}"
-            
-            return {
-                "question_id": str(uuid.uuid4()),
-                "question": question_text,
-                "options": options,
-                "correct_answer": data.get("correct_answer", "A").strip(),
-                "topic": data.get("topic", topic),
-                "difficulty": difficulty,
-                "segment": segment_type,
-                "reasoning_required": False,  # No additional reasoning for A-R type
-            }
-        
+
+
+def _iter_array_items(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Yield each element of the first JSON array in streamed text as soon as
+    its closing bracket arrives. Anything after the array, or a malformed
+    element that never completes, is ignored.
+    """
+    buf = ""
+    pos = None  # just inside the array once its "[" has been seen
+    for chunk in chunks:
+        buf += chunk
+        if pos is None:
+            start = buf.find("[")
+            if start < 0:
+                continue
+            pos = start + 1
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                return
+            try:
+                item, pos = _DECODER.raw_decode(buf, pos)
+            except ValueError:
+                break  # element still incomplete; wait for more text
+            yield item
+        buf, pos = buf[pos:], 0
+
+
+def iter_batch_questions(domain: str, specs: list) -> Iterator[tuple]:
+    """
+    Stream several questions from ONE Gemini call returning a JSON array.
+
+    specs: list of {"topic", "difficulty", "segment"} dicts (segment is "A"/"B" for hard).
+    Yields (slot index, validated question) pairs as each item finishes
+    generating; items that are missing, malformed or invalid are skipped.
+    """
+    segment_types = [_segment_type(spec["difficulty"], spec.get("segment")) for spec in specs]
+    prompt = _batch_prompt(domain, specs, segment_types)
+
+    seen = set()
+    for position, item in enumerate(_iter_array_items(call_gemini_stream(prompt, response_schema=BATCH_SCHEMA))):
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index", position + 1)
+        if not isinstance(index, int) or not 1 <= index <= len(specs) or index in seen:
+            continue
+        seen.add(index)
+        spec = specs[index - 1]
+        try:
+            question = _shape_question(item, spec["topic"], spec["difficulty"], segment_types[index - 1])
+        except Exception as e:
+            logger.info("Dropping malformed item %d: %s", index, e)
+            continue
+        is_valid, fixed_question, error = validate_and_fix_question(question)
+        if is_valid:
+            yield index - 1, fixed_question
         else:
-            # MCQ or MCQ_REASONING format
-            question_text = data.get("question", "").strip()
-            options = data.get("options", [])
-            
-            # Validation
-            if not question_text:
-                raise ValueError("Empty question text")
-            if len(options) != 4:
-                raise ValueError(f"Expected 4 options, got {len(options)}")
-            
-            return {
-                "question_id": str(uuid.uuid4()),
-                "question": question_text,
-                "options": options,
-                "correct_answer": data.get("correct_answer", "A").strip(),
-                "topic": data.get("topic", topic),
-                "difficulty": difficulty,
-                "segment": segment_type,
-                "reasoning_required": (segment_type == "MCQ_REASONING"),
-            }
-            
+            logger.info("Item %d failed validation: %s", index, error)
+
+
+def generate_batch_questions_single_call(domain: str, specs: list) -> list:
+    """
+    Collect iter_batch_questions into a list aligned with specs.
+
+    Slots whose item was missing or failed validation are None so callers
+    can regenerate just those. Items parsed before a mid-stream failure
+    are kept.
+    """
+    results = [None] * len(specs)
+    try:
+        for index, question in iter_batch_questions(domain, specs):
+            results[index] = question
     except Exception as e:
-        print(f"[ERROR] Question generation failed: {e}")
-        import traceback
-        traceback.print_exc()
-        
-        # Generate varied fallback questions to avoid repetition
-        fallback_starters = [
-            f"How does {topic} improve system performance in {domain}?",
-            f"Which scenario best demonstrates the application of {topic}?",
-            f"In {domain}, when would you choose {topic} over alternative approaches?",
-            f"Explain the relationship between {topic} and real-world {domain} implementations.",
-            f"Which factor is most critical when implementing {topic} in {domain}?",
-            f"Compare the advantages of using {topic} in different {domain} contexts.",
-            f"Identify the key characteristic that defines {topic} in {domain}.",
-            f"What trade-off is associated with applying {topic} in {domain} systems?",
-        ]
-        
-        fallback_options_sets = [
-            [
-                "A) It optimizes resource allocation",
-                "B) It enhances system modularity",
-                "C) It improves maintainability",
-                "D) It reduces computational complexity"
-            ],
-            [
-                "A) When scalability is the primary concern",
-                "B) When performance optimization is needed",
-                "C) When maintainability outweighs efficiency",
-                "D) When security is the top priority"
-            ],
-            [
-                "A) High throughput with moderate latency",
-                "B) Low latency with variable throughput",
-                "C) Balanced performance across metrics",
-                "D) Maximum reliability with minimal overhead"
-            ],
-            [
-                "A) It provides a structured approach to problem decomposition",
-                "B) It enables parallel processing capabilities",
-                "C) It simplifies error handling mechanisms",
-                "D) It facilitates rapid prototyping"
-            ]
-        ]
-        
-        # Randomly select fallback question and options
-        selected_question = random.choice(fallback_starters)
-        selected_options = random.choice(fallback_options_sets)
-        correct_answers = ["A", "B", "C", "D"]
-        selected_answer = random.choice(correct_answers)
-        
-        # Strict fallback based on difficulty
-        if difficulty == "easy":
-            return {
-                "question_id": str(uuid.uuid4()),
-                "question": selected_question,
-                "options": selected_options,
-                "correct_answer": selected_answer,
-                "topic": topic,
-                "difficulty": "easy",
-                "segment": "MCQ",
-                "reasoning_required": False,
-            }
-        elif difficulty == "moderate":
-            return {
-                "question_id": str(uuid.uuid4()),
-                "question": selected_question,
-                "options": selected_options,
-                "correct_answer": selected_answer,
-                "topic": topic,
-                "difficulty": "moderate",
-                "segment": "MCQ",
-                "reasoning_required": False,
-            }
-        else:  # hard
-            if segment_type == "ASSERTION_REASON":
-                assertion_starters = [
-                    f"{topic} is essential for achieving optimal performance in {domain}.",
-                    f"Implementing {topic} requires understanding of underlying system constraints in {domain}.",
-                    f"The effectiveness of {topic} depends on proper context evaluation in {domain}.",
-                    f"Mastery of {topic} directly correlates with system reliability in {domain}."
-                ]
-                
-                reason_starters = [
-                    "It provides a systematic framework for addressing complex challenges.",
-                    "It enables predictable behavior under varying conditions.",
-                    "It establishes clear boundaries for system operation.",
-                    "It facilitates efficient resource management and allocation."
-                ]
-                
-                return {
-                    "question_id": str(uuid.uuid4()),
-                    "question": f"Assertion (A): {random.choice(assertion_starters)}\n\nReason (R): {random.choice(reason_starters)}",
-                    "options": [
-                        "A) Both A and R are true, and R is the correct explanation of A",
-                        "B) Both A and R are true, but R is NOT the correct explanation of A",
-                        "C) A is true, but R is false",
-                        "D) A is false, but R is true"
-                    ],
-                    "correct_answer": random.choice(["A", "B"]),
-                    "topic": topic,
-                    "difficulty": "hard",
-                    "segment": "ASSERTION_REASON",
-                    "reasoning_required": False,
-                }
-            else:
-                hard_questions = [
-                    f"Analyze the trade-offs involved when implementing {topic} in {domain}. Which factor is most critical?",
-                    f"In a resource-constrained {domain} environment, how would {topic} impact system design decisions?",
-                    f"Evaluate the implications of choosing {topic} over alternative approaches in {domain}. What is the primary consideration?",
-                    f"When optimizing for both performance and maintainability in {domain}, how does {topic} influence the balance?"
-                ]
-                
-                hard_options_sets = [
-                    [
-                        "A) Performance optimization takes precedence",
-                        "B) Resource allocation constraints dominate",
-                        "C) Contextual requirements drive the decision",
-                        "D) Scalability concerns override other factors"
-                    ],
-                    [
-                        "A) Minimizing latency while maintaining throughput",
-                        "B) Balancing complexity with maintainability",
-                        "C) Ensuring reliability without excessive overhead",
-                        "D) Achieving modularity while preserving efficiency"
-                    ],
-                    [
-                        "A) System architecture compatibility",
-                        "B) Development team expertise",
-                        "C) Long-term maintenance costs",
-                        "D) Immediate performance gains"
-                    ]
-                ]
-                
-                return {
-                    "question_id": str(uuid.uuid4()),
-                    "question": random.choice(hard_questions),
-                    "options": random.choice(hard_options_sets),
-                    "correct_answer": random.choice(["A", "B", "C", "D"]),
-                    "topic": topic,
-                    "difficulty": "hard",
-                    "segment": "MCQ_REASONING",
-                    "reasoning_required": True,
-                }
+        logger.warning("Single-call generation failed: %s", e)
+    return results
 
 
+def _slot_specs(slots: list) -> list:
+    return [{"topic": topic, "difficulty": diff, "segment": segment} for topic, diff, segment in slots]
 
-def generate_batch_questions(domain: str, count: int = 10, difficulty: str = "moderate") -> list:
+
+def _generate_slots(domain: str, slots: list) -> list:
+    """Single-call generation for a list of (topic, difficulty, segment) slots."""
+    return generate_batch_questions_single_call(domain, _slot_specs(slots))
+
+
+def _refill_questions(domain: str, slot: tuple, n: int) -> list:
+    """Produce up to n pool questions for one (topic, difficulty, segment) slot."""
+    return _generate_slots(domain, [slot] * min(n, BATCH_CALL_SIZE))
+
+
+def _take_pooled(domain: str, plan: list) -> tuple:
+    """Pop a pooled question for every slot that has one; None elsewhere."""
+    keys = [question_cache.pool_key(domain, *slot) for slot in plan]
+    questions = [question_cache.get_question(key) for key in keys]
+    served = sum(q is not None for q in questions)
+    if served:
+        logger.info("Served %d/%d questions from pool", served, len(plan))
+    return keys, questions
+
+
+def _schedule_refills(domain: str, keys: list, plan: list, missed: list) -> None:
     """
-    Generate a batch of questions for a given domain with difficulty-aware logic.
-    
+    Queue background refills for the pool buckets the batch missed.
+
+    Only predefined domains are pooled: custom domains are free text, so
+    pooling them would grow the pool without bound and rarely be reused.
+    question_cache caps refill size and how many run at once.
+    """
+    if domain not in _DOMAIN_TOPICS:
+        return
+    for key, slot in dict((keys[i], plan[i]) for i in missed).items():
+        question_cache.schedule_refill(key, functools.partial(_refill_questions, domain, slot))
+
+
+def _chunk(indices: list) -> list:
+    return [indices[i:i + BATCH_CALL_SIZE] for i in range(0, len(indices), BATCH_CALL_SIZE)]
+
+
+def iter_batch_questions_as_completed(domain: str, count: int = 10, difficulty: str = "moderate") -> Iterator[tuple]:
+    """
+    Yield (slot index, question) pairs for a batch as each question is ready.
+
+    Slots are served from the pre-generated question pool first. The rest
+    are requested BATCH_CALL_SIZE at a time with one streamed Gemini call
+    per chunk; any slot missing from or invalid in those responses is
+    regenerated individually. The blocking Gemini calls overlap on a
+    thread pool (socket reads release the GIL). Pool buckets that missed
+    are refilled in the background afterwards.
+
+    Pooled questions come out first, then streamed single-call items as
+    they parse, then individually regenerated slots. Every slot is yielded
+    exactly once.
+
     Difficulty behavior:
     - "easy": All questions are easy (definitions, basic concepts)
     - "moderate": Mix of questions with practical application focus
     - "hard": Alternating segments A and B (reasoning/MCQ, case/assertion)
-    
+    """
+    plan = _plan_batch(domain, count, difficulty)
+    keys, questions = _take_pooled(domain, plan)
+    for i, question in enumerate(questions):
+        if question is not None:
+            yield i, question
+    pending = [i for i, q in enumerate(questions) if q is None]
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(GEMINI_MAX_CONCURRENCY, len(pending))) as executor:
+            ready: "queue.Queue[Optional[tuple]]" = queue.Queue()
+
+            def stream_chunk(chunk: list) -> None:
+                try:
+                    for j, question in iter_batch_questions(domain, _slot_specs([plan[i] for i in chunk])):
+                        ready.put((chunk[j], question))
+                except Exception as e:
+                    logger.warning("Single-call chunk failed: %s", e)
+                finally:
+                    ready.put(None)  # chunk finished
+
+            chunks = _chunk(pending)
+            for chunk in chunks:
+                executor.submit(stream_chunk, chunk)
+            remaining = len(chunks)
+            while remaining:
+                item = ready.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                i, question = item
+                questions[i] = question
+                yield i, question
+
+            # Regenerate only the slots that came back missing or invalid
+            missing = [i for i, q in enumerate(questions) if q is None]
+            if missing:
+                logger.info("Regenerating %d/%d slots individually", len(missing), count)
+                futures = {executor.submit(_generate_with_retries, domain, *plan[i]): i for i in missing}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        question = future.result()
+                    except Exception as e:
+                        logger.warning("Slot %d failed: %s", i, e)
+                        question = _fallback_batch_question(domain, *plan[i])
+                    yield i, question
+
+    _schedule_refills(domain, keys, plan, pending)
+
+
+def generate_batch_questions(domain: str, count: int = 10, difficulty: str = "moderate") -> list:
+    """
+    Generate a batch of questions for a given domain with difficulty-aware logic.
+
+    Collects iter_batch_questions_as_completed by slot index, so ordering
+    matches the plan regardless of completion order.
+
     Returns list of question dicts with: question_id, question, correct_answer, topic, difficulty
     """
-    
-    # Define topic pools per domain
-    domain_topics = {
-        "machine-learning": [
-            "Supervised Learning", "Unsupervised Learning", "Neural Networks",
-            "Model Evaluation", "Overfitting & Regularization", "Feature Engineering",
-            "Ensemble Methods", "Deep Learning", "Transfer Learning", "Model Deployment"
-        ],
-        "data-science": [
-            "Data Preprocessing", "Statistical Analysis", "Data Visualization",
-            "Hypothesis Testing", "Regression Analysis", "Classification",
-            "Clustering", "Time Series Analysis", "A/B Testing", "ETL Pipelines"
-        ],
-        "operating-systems": [
-            "Process Management", "Memory Management", "File Systems",
-            "Concurrency", "Deadlocks", "Scheduling Algorithms",
-            "Virtual Memory", "I/O Management", "System Calls", "Synchronization"
-        ],
-        "web-development": [
-            "HTTP Protocol", "RESTful APIs", "Frontend Frameworks",
-            "Backend Architecture", "Database Design", "Authentication",
-            "State Management", "Responsive Design", "Performance Optimization", "Security"
-        ],
-        "computer-networks": [
-            "OSI Model", "TCP/IP Protocol", "Routing Algorithms",
-            "Network Security", "DNS", "Load Balancing",
-            "Network Topologies", "Firewalls", "VPN", "Quality of Service"
-        ],
-    }
-    
-    topics = domain_topics.get(domain, ["General Concepts"] * count)
-    
-    # For custom domains (not in predefined list), create varied topic angles
-    if domain not in domain_topics:
-        # Generate varied aspects/subtopics for custom domains
-        custom_angles = [
-            f"{domain} - Fundamentals",
-            f"{domain} - Architecture & Design",
-            f"{domain} - Implementation Strategies",
-            f"{domain} - Best Practices",
-            f"{domain} - Common Challenges",
-            f"{domain} - Performance & Optimization",
-            f"{domain} - Security Considerations",
-            f"{domain} - Real-World Applications",
-            f"{domain} - Advanced Concepts",
-            f"{domain} - Industry Standards"
-        ]
-        topics = custom_angles
-    
-    # SHUFFLE topics to ensure different subtopic selection each time
-    topics_copy = topics.copy()
-    random.shuffle(topics_copy)
-    
-    # Cycle through shuffled topics if we need more questions than topics available
-    selected_topics = []
-    for i in range(count):
-        selected_topics.append(topics_copy[i % len(topics_copy)])
-    
-    questions = []
-    
-    # Set difficulty distribution based on user's chosen level
-    if difficulty == "easy":
-        difficulties = ["easy"] * count
-        segments = [None] * count
-    elif difficulty == "hard":
-        # Alternate between segment A and B for hard difficulty
-        difficulties = ["hard"] * count
-        segments = ["A" if i % 2 == 0 else "B" for i in range(count)]
-    else:  # moderate
-        # Mix of difficulties skewed toward moderate
-        difficulties = ["easy", "moderate", "moderate", "moderate", "hard",
-                       "moderate", "moderate", "hard", "moderate", "moderate"]
-        if count > len(difficulties):
-            difficulties.extend(["moderate"] * (count - len(difficulties)))
-        difficulties = difficulties[:count]
-        segments = [None] * count
-    
-    for idx, (topic, diff, segment) in enumerate(zip(selected_topics, difficulties, segments)):
-        max_retries = 3
-        question = None
-        
-        for attempt in range(max_retries):
-            try:
-                question = generate_question_with_answer(domain, topic, diff, segment)
-                
-                # Validate and auto-fix the question
-                is_valid, fixed_question, error = validate_and_fix_question(question)
-                
-                if is_valid:
-                    questions.append(fixed_question)
-                    print(f"[BATCH] Generated {idx + 1}/{count}: {topic} (difficulty={diff}, segment={fixed_question.get('segment')})")
-                    break
-                else:
-                    print(f"[BATCH] Validation failed (attempt {attempt + 1}/{max_retries}): {error}")
-                    if attempt < max_retries - 1:
-                        print(f"[BATCH] Regenerating question for {topic}...")
-                    else:
-                        # Use the fixed version anyway on last attempt
-                        print(f"[BATCH] Using auto-fixed question despite validation warning")
-                        questions.append(fixed_question)
-            except Exception as e:
-                print(f"[BATCH] Generation error (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:
-                    # On final attempt, create a simple fallback
-                    print(f"[BATCH] Using fallback question for {topic}")
-                    fallback = {
-                        "question_id": str(uuid.uuid4()),
-                        "question": f"Explain the key concepts of {topic} in {domain}.",
-                        "options": ["A) Option 1", "B) Option 2", "C) Option 3", "D) Option 4"],
-                        "correct_answer": "A",
-                        "topic": topic,
-                        "difficulty": diff,
-                        "segment": "MCQ" if diff != "hard" else ("MCQ_REASONING" if segment == "A" else "ASSERTION_REASON"),
-                        "reasoning_required": (diff == "hard" and segment == "A"),
-                    }
-                    questions.append(fallback)
-    
+    questions = [None] * count
+    for i, question in iter_batch_questions_as_completed(domain, count, difficulty):
+        questions[i] = question
     return questions
-
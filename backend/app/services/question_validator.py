@@ -3,8 +3,24 @@ Question validation utilities for strict difficulty-based enforcement.
 
 Ensures all generated questions conform to the required format for each difficulty level.
 """
-import re
-from typing import Dict, Any, Optional
+import sys
+from typing import Dict, Any, Final, FrozenSet, List, Optional, Set, Tuple
+
+# Option labels, in order
+EXPECTED_PREFIXES: Final[Tuple[str, ...]] = ("A)", "B)", "C)", "D)")
+_VALID_DIFF: Final[FrozenSet[str]] = frozenset(("easy", "moderate", "hard"))
+_HARD_SEGMENTS: Final[FrozenSet[str]] = frozenset(("MCQ_REASONING", "ASSERTION_REASON"))
+# Definition/terminology phrasing expected of easy questions
+DEFINITION_KW: Final[Tuple[str, ...]] = ("what is", "which of the following", "define", "identify", "name")
+# Application/scenario phrasing expected of moderate questions
+APPLICATION_KW: Final[Tuple[str, ...]] = ("how", "why", "when would", "scenario", "apply", "use")
+# Phrases from the standard assertion-reason options
+AR_KW: Final[Tuple[str, ...]] = (
+    "both a and r are true",
+    "correct explanation",
+    "a is true",
+    "a is false",
+)
 
 
 def validate_question(question: Dict[str, Any]) -> tuple[bool, Optional[str]]:
@@ -18,28 +34,52 @@ def validate_question(question: Dict[str, Any]) -> tuple[bool, Optional[str]]:
     - Moderate: MCQ only, 4 options, application-based
     - Hard: Segment A (MCQ + reasoning) or Segment B (Assertion-Reasoning)
     """
-    
-    difficulty = question.get("difficulty", "").lower()
-    segment = question.get("segment", "MCQ")
-    options = question.get("options", [])
-    question_text = question.get("question", "")
-    reasoning_required = question.get("reasoning_required", False)
+    return _validate_fields(
+        question.get("difficulty", "").lower(),
+        question.get("segment", "MCQ"),
+        question.get("options", []),
+        question.get("question", ""),
+        question.get("reasoning_required", False),
+        question.get("correct_answer", ""),
+    )
+
+
+def _validate_fields(
+    difficulty: str,
+    segment: Optional[str],
+    options: List[str],
+    question_text: str,
+    reasoning_required: bool,
+    correct_answer: str,
+    labels_fixed: bool = False,
+) -> tuple[bool, Optional[str]]:
+    """
+    validate_question on already-extracted fields. labels_fixed skips the
+    option label check for options that were just relabeled.
+    """
+    # Fail fast on an unusable difficulty/segment before any other work
+    if difficulty not in _VALID_DIFF:
+        return False, f"Invalid difficulty level: {difficulty}. Must be easy, moderate, or hard"
+    if difficulty == "hard" and segment not in _HARD_SEGMENTS:
+        return False, f"Hard difficulty must use MCQ_REASONING or ASSERTION_REASON segment, got {segment}"
     
     # Common validations
     if not question_text or len(question_text.strip()) < 10:
         return False, "Question text is too short or empty"
+    qlower = question_text.lower()
     
     if not options or len(options) != 4:
         return False, f"Expected exactly 4 options, got {len(options)}"
     
     # Validate options are properly labeled A, B, C, D
-    expected_prefixes = ["A)", "B)", "C)", "D)"]
-    for i, option in enumerate(options):
-        if not option.strip().startswith(expected_prefixes[i]):
-            return False, f"Option {i+1} must start with '{expected_prefixes[i]}'"
+    if not labels_fixed:
+        for i, (option, prefix) in enumerate(zip(options, EXPECTED_PREFIXES), start=1):
+            # Only strip when the label isn't already at the very start
+            if not (option.startswith(prefix) or option.lstrip().startswith(prefix)):
+                return False, f"Option {i} must start with '{prefix}'"
     
-    correct_answer = question.get("correct_answer", "").strip().upper()
-    if correct_answer not in ["A", "B", "C", "D"]:
+    correct_answer = correct_answer.strip().upper() if correct_answer else ""
+    if len(correct_answer) != 1 or correct_answer not in "ABCD":
         return False, f"Invalid correct_answer: {correct_answer}. Must be A, B, C, or D"
     
     # Difficulty-specific validations
@@ -51,8 +91,7 @@ def validate_question(question: Dict[str, Any]) -> tuple[bool, Optional[str]]:
             return False, "Easy questions should not require reasoning"
         
         # Check for definition/terminology style (basic check)
-        definition_keywords = ["what is", "which of the following", "define", "identify", "name"]
-        is_definition_style = any(keyword in question_text.lower() for keyword in definition_keywords)
+        is_definition_style = any(keyword in qlower for keyword in DEFINITION_KW)
         
         if not is_definition_style:
             # Soft warning - don't fail validation but log
@@ -66,8 +105,7 @@ def validate_question(question: Dict[str, Any]) -> tuple[bool, Optional[str]]:
             return False, "Moderate questions should not require reasoning (use hard for that)"
         
         # Check for application/scenario style (basic check)
-        application_keywords = ["how", "why", "when would", "scenario", "apply", "use"]
-        is_application_style = any(keyword in question_text.lower() for keyword in application_keywords)
+        is_application_style = any(keyword in qlower for keyword in APPLICATION_KW)
         
         if not is_application_style:
             print(f"[VALIDATION WARNING] Moderate question may not be application-based: {question_text[:50]}")
@@ -87,37 +125,48 @@ def validate_question(question: Dict[str, Any]) -> tuple[bool, Optional[str]]:
             if reasoning_required:
                 return False, "ASSERTION_REASON questions should not require additional reasoning"
             
-            # Check for assertion/reason structure
-            has_assertion = "assertion" in question_text.lower() or "assertion (a)" in question_text.lower()
-            has_reason = "reason" in question_text.lower() or "reason (r)" in question_text.lower()
+            # Check for assertion/reason structure ("assertion (a)" / "reason (r)" contain these)
+            has_assertion = "assertion" in qlower
+            has_reason = "reason" in qlower
             
             if not (has_assertion and has_reason):
                 return False, "ASSERTION_REASON must contain both Assertion and Reason statements"
             
-            # Validate options follow A-R format
-            required_ar_keywords = [
-                "both a and r are true",
-                "correct explanation",
-                "a is true",
-                "a is false"
-            ]
+            # Validate options follow A-R format: at least 2 distinct standard
+            # phrases; the standard option A alone already has two
+            ar_matches: Set[str] = set()
+            for option in options:
+                option_lower = option.lower()
+                ar_matches.update(keyword for keyword in AR_KW if keyword in option_lower)
+                if len(ar_matches) >= 2:
+                    break
             
-            options_text = " ".join([opt.lower() for opt in options])
-            ar_match_count = sum(1 for keyword in required_ar_keywords if keyword in options_text)
-            
-            if ar_match_count < 2:
+            if len(ar_matches) < 2:
                 return False, "ASSERTION_REASON options must follow standard A-R format"
-        
-        else:
-            return False, f"Hard difficulty must use MCQ_REASONING or ASSERTION_REASON segment, got {segment}"
-    
-    else:
-        return False, f"Invalid difficulty level: {difficulty}. Must be easy, moderate, or hard"
     
     # All validations passed
     return True, None
 
 
+def _strip_label(text: str) -> str:
+    """Drop a leading "A)".."D)" label and the whitespace after it."""
+    if len(text) >= 2 and text[0] in "ABCD" and text[1] == ")":
+        return text[2:].lstrip()
+    return text
+
+
+# Only short options are interned, so the intern table stays bounded
+_INTERN_MAX_LEN: Final[int] = 128
+
+
+def _intern_option(option: str) -> str:
+    """
+    Intern short relabeled options: template options ("A) Both A and R are
+    true...") repeat across a batch and then share one string object.
+    """
+    return sys.intern(option) if len(option) < _INTERN_MAX_LEN else option
+
+
 def auto_fix_question(question: Dict[str, Any]) -> Dict[str, Any]:
     """
     Attempt to auto-fix common validation issues.
@@ -128,13 +177,12 @@ def auto_fix_question(question: Dict[str, Any]) -> Dict[str, Any]:
     options = question.get("options", [])
     labels = ["A)", "B)", "C)", "D)"]
     
-    fixed_options = []
+    fixed_options: List[str] = []
     for i, option in enumerate(options[:4]):  # Ensure only 4 options
-        opt_text = option.strip()
         # Remove existing label if present
-        opt_text = re.sub(r'^[A-D]\)\s*', '', opt_text)
+        opt_text = _strip_label(option.strip())
         # Add correct label
-        fixed_options.append(f"{labels[i]} {opt_text}")
+        fixed_options.append(_intern_option(f"{labels[i]} {opt_text}"))
     
     question["options"] = fixed_options
     
@@ -142,9 +190,8 @@ def auto_fix_question(question: Dict[str, Any]) -> Dict[str, Any]:
     if "correct_answer" in question:
         answer = question["correct_answer"].strip().upper()
         # Extract just the letter
-        match = re.match(r'^([A-D])', answer)
-        if match:
-            question["correct_answer"] = match.group(1)
+        if answer and answer[0] in "ABCD":
+            question["correct_answer"] = answer[0]
     
     # Set segment based on difficulty if missing
     difficulty = question.get("difficulty", "moderate").lower()
@@ -169,12 +216,95 @@ def validate_and_fix_question(question: Dict[str, Any]) -> tuple[bool, Dict[str,
     Validate and attempt to auto-fix a question.
     
     Returns: (is_valid, fixed_question, error_message)
+    fixed_question is the input itself when it needed no fixing.
     """
-    
-    # First attempt auto-fix
-    fixed_question = auto_fix_question(question.copy())
-    
-    # Then validate
-    is_valid, error = validate_question(fixed_question)
-    
-    return is_valid, fixed_question, error
+    if _is_wellformed(question):
+        # Nothing for auto-fix to change: validate and hand back the original
+        is_valid, error = _validate_fields(
+            question["difficulty"].lower(),
+            question["segment"],
+            question["options"],
+            question.get("question", ""),
+            question["reasoning_required"],
+            question["correct_answer"],
+            labels_fixed=True,
+        )
+        return is_valid, question, error
+    return _fix_and_validate(question)
+
+
+def _is_wellformed(question: Dict[str, Any]) -> bool:
+    """True when auto_fix_question would leave the question unchanged."""
+    options = question.get("options")
+    if type(options) is not list or len(options) != 4:
+        return False
+    for option, prefix in zip(options, EXPECTED_PREFIXES):
+        # "A) text": label, one space, no stray surrounding whitespace
+        if (type(option) is not str or len(option) < 4 or not option.startswith(prefix)
+                or option[2] != " " or option[3].isspace() or option[-1].isspace()):
+            return False
+    answer = question.get("correct_answer")
+    segment = question.get("segment", 0)
+    return (
+        type(answer) is str and len(answer) == 1 and answer in "ABCD"
+        and segment != 0
+        and question.get("reasoning_required") is (segment == "MCQ_REASONING")
+        and type(question.get("difficulty")) is str
+    )
+
+
+# Segment auto_fix_question assigns when a question has none
+_DEFAULT_SEGMENTS: Final[Dict[str, str]] = {"easy": "MCQ", "moderate": "MCQ", "hard": "MCQ_REASONING"}
+
+
+def _fix_and_validate(question: Dict[str, Any]) -> tuple[bool, Dict[str, Any], Optional[str]]:
+    """
+    auto_fix_question followed by validate_question, fused: fields are read
+    once, options are relabeled in a single pass (so the label check can be
+    skipped) and the original question is left untouched.
+    """
+    fixed: Dict[str, Any] = dict(question)
+    fixed["options"] = options = [
+        _intern_option(f"{prefix} {_strip_label(option.strip())}")
+        for prefix, option in zip(EXPECTED_PREFIXES, question.get("options", []))
+    ]
+
+    # Normalize correct_answer to just the letter
+    if "correct_answer" in question:
+        answer = question["correct_answer"].strip().upper()
+        if answer and answer[0] in "ABCD":
+            fixed["correct_answer"] = answer[0]
+
+    # Set segment based on difficulty if missing
+    if "segment" in question:
+        segment = question["segment"]
+    else:
+        segment = _DEFAULT_SEGMENTS.get(question.get("difficulty", "moderate").lower())
+        if segment is None:
+            segment = "MCQ"
+        else:
+            fixed["segment"] = segment
+
+    fixed["reasoning_required"] = reasoning_required = segment == "MCQ_REASONING"
+
+    is_valid, error = _validate_fields(
+        question.get("difficulty", "").lower(),
+        segment,
+        options,
+        question.get("question", ""),
+        reasoning_required,
+        fixed.get("correct_answer", ""),
+        labels_fixed=True,
+    )
+    return is_valid, fixed, error
+
+
+def validate_questions(
+    questions: List[Dict[str, Any]],
+) -> List[tuple[bool, Dict[str, Any], Optional[str]]]:
+    """
+    validate_and_fix_question over a batch, in order.
+
+    Returns one (is_valid, fixed_question, error_message) per input.
+    """
+    return [validate_and_fix_question(question) for question in questions]
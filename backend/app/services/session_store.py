@@ -1,36 +1,91 @@
+import threading
 import uuid
-from typing import Dict, Any
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Any, List, Optional
+
+
+@dataclass(slots=True)
+class Question:
+    question_id: str
+    question: str
+    difficulty: str
+    topic: str = ""
+    options: List[Any] = field(default_factory=list)
+    correct_answer: Optional[str] = None
+    segment: Optional[str] = None
+    reasoning_required: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Question":
+        return cls(
+            question_id=data.get("question_id") or str(uuid.uuid4()),
+            question=data.get("question", ""),
+            difficulty=data.get("difficulty", ""),
+            topic=data.get("topic", ""),
+            options=list(data.get("options", [])),
+            correct_answer=data.get("correct_answer"),
+            segment=data.get("segment"),
+            reasoning_required=bool(data.get("reasoning_required", False)),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class Session:
+    subject: str
+    topic: str
+    questions: List[Question] = field(default_factory=list)
+    questions_by_id: Dict[str, Question] = field(default_factory=dict)
+    responses: List[Dict[str, Any]] = field(default_factory=list)
+    confidence: Optional[Dict[str, Any]] = None
+
 
 # GLOBAL in-memory session store
 # NOTE: This is fine for development
-sessions: Dict[str, Dict[str, Any]] = {}
+sessions: Dict[str, Session] = {}
+_lock = threading.Lock()
 
 
 def create_session(subject: str, topic: str) -> str:
     session_id = str(uuid.uuid4())
 
-    sessions[session_id] = {
-        "subject": subject,
-        "topic": topic,
-        "questions": [],
-        "responses": [],
-        "confidence": None,
-    }
+    sessions[session_id] = Session(subject=subject, topic=topic)
 
     return session_id
 
 
-def get_session(session_id: str) -> Dict[str, Any] | None:
+def get_session(session_id: str) -> Session | None:
     return sessions.get(session_id)
 
 
 def add_question(session_id: str, question: dict):
-    sessions[session_id]["questions"].append(question)
+    add_questions(session_id, [question])
+
+
+def add_questions(session_id: str, questions: List[dict]):
+    """Append a whole batch of questions under a single lock acquisition."""
+    stored = [Question.from_dict(q) for q in questions]
+    with _lock:
+        session = sessions[session_id]
+        session.questions.extend(stored)
+        for q in stored:
+            session.questions_by_id[q.question_id] = q
+
+
+def find_question(session_id: str, question_id: str) -> Question | None:
+    """Look up a stored question by id without scanning the question list."""
+    session = sessions.get(session_id)
+    if not session:
+        return None
+    return session.questions_by_id.get(question_id)
 
 
 def add_response(session_id: str, response: dict):
-    sessions[session_id]["responses"].append(response)
+    with _lock:
+        sessions[session_id].responses.append(response)
 
 
 def set_confidence(session_id: str, confidence: dict):
-    sessions[session_id]["confidence"] = confidence
+    sessions[session_id].confidence = confidence
@@ -1,7 +1,19 @@
-import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
 import vertexai
 from vertexai.language_models import TextGenerationModel
 from app.config import PROJECT_ID, VERTEX_LOCATION, VERTEX_API_KEY
+from app.services import llm_cache
+
+try:
+    import orjson as _json  # optional dependency; faster parsing of model output
+except ImportError:
+    import json as _json
+
+logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = """
 You are a world-class educational content analyst and technical writer. Your mission is to create an exceptionally detailed, comprehensive summary that transforms complex documents into clear, accessible learning resources.
@@ -88,12 +100,75 @@ Return ONLY valid JSON (no markdown, no code blocks):
 }
 """
 
+# Built once; each call only appends the document
+PROMPT_PREFIX = SYSTEM_PROMPT + "\n\nDocument to analyze:\n"
+MAX_INPUT_CHARS = 18000
+# Byte budget for the same cutoff: ~18k chars of Latin text in UTF-8, and
+# a tighter ceiling for scripts that need 2-4 bytes per character
+MAX_INPUT_BYTES = 22000
+
+MODEL_NAME = "gemini-1.5-flash-002"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    """Return the shared model handle.
+
+    SDK init and from_pretrained do auth and network setup, so they run
+    once per process instead of on every summary.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                vertexai.init(project=PROJECT_ID, location=VERTEX_LOCATION)
+                _model = TextGenerationModel.from_pretrained(MODEL_NAME)
+    return _model
+
+
+def warm_up() -> None:
+    """Load the model handle ahead of the first summary request."""
+    _get_model()
+
+
+def _strip_fences(text: str) -> str:
+    """Remove a ```json / ``` code fence wrapped around the model output."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
 def summarize_text(text: str) -> dict:
-    vertexai.init(project=PROJECT_ID, location=VERTEX_LOCATION)
-    model = TextGenerationModel.from_pretrained("gemini-1.5-flash-002")
-    
     # Increase input context for better understanding
-    prompt = SYSTEM_PROMPT + "\n\nDocument to analyze:\n" + text[:18000]
+    return _summarize_body(_truncate(text))
+
+
+def _truncate(text: str) -> str:
+    """Cut text to MAX_INPUT_CHARS and MAX_INPUT_BYTES of UTF-8, on a character boundary."""
+    body = text if len(text) <= MAX_INPUT_CHARS else text[:MAX_INPUT_CHARS]
+    # ASCII is one byte per char and already fits; isascii() is O(1)
+    if body.isascii():
+        return body
+    # Only the char-bounded prefix is encoded, never the whole document
+    encoded = body.encode("utf-8")
+    if len(encoded) <= MAX_INPUT_BYTES:
+        return body
+    return encoded[:MAX_INPUT_BYTES].decode("utf-8", errors="ignore")
+
+
+# Keyed on the truncated body, so documents that only differ past the
+# cutoff share a summary; only successful summaries are stored.
+@llm_cache.cached(ttl=3600, maxsize=256)
+def _summarize_body(body: str) -> dict:
+    model = _get_model()
+    prompt = PROMPT_PREFIX + body
     
     response = model.predict(
         prompt,
@@ -102,5 +177,32 @@ def summarize_text(text: str) -> dict:
         top_p=0.9,
         top_k=50
     )
-    cleaned = response.text.replace("```json", "").replace("```", "").strip()
-    return json.loads(cleaned)
\ No newline at end of file
+    return _json.loads(_strip_fences(response.text))
+
+
+def summarize_batch(texts: List[str], max_workers: int = 8) -> List[Optional[dict]]:
+    """
+    Summarize several documents with concurrent Vertex predictions.
+
+    predict() is blocking network I/O, so a thread pool overlaps the round
+    trips. Results line up with texts; a document whose summary failed
+    gets None so callers can fall back per document.
+    """
+    if not texts:
+        return []
+    try:
+        _get_model()  # load once up front rather than racing in every worker
+    except Exception as e:
+        # Every document would fail the same way
+        logger.warning("Vertex model unavailable, skipping batch summaries: %s", e)
+        return [None] * len(texts)
+
+    def safe_summarize(text: str) -> Optional[dict]:
+        try:
+            return summarize_text(text)
+        except Exception as e:
+            logger.warning("Batch summary failed: %s", e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as executor:
+        return list(executor.map(safe_summarize, texts))
@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration for serving the backend.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Most request time is spent waiting on Document AI, Vertex and Gemini, so
+each worker runs a pool of threads and keeps serving other requests while
+those calls are in flight (blocking socket I/O releases the GIL).
+
+Sessions live in process memory (app/services/session_store.py), so a
+session created on one worker does not exist on another. Keep a single
+worker and scale with threads until sessions move to a shared store.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+# LLM / OCR calls can legitimately take tens of seconds
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    # Each worker warms up its own clients and pools
+    from app.main import start_warmup
+
+    start_warmup()
@@ -0,0 +1,87 @@
+"""
+Golden tests for the line handling in pdf_parser.
+
+Run from backend/:  python -m pytest tests  (or python -m tests.test_pdf_parser)
+"""
+import random
+
+from app.services.pdf_parser import _is_heading, normalize_text, split_into_sections
+
+
+def _baseline_normalize(text):
+    """Reference: the original splitlines()-based normalize_text."""
+    return "\n".join(line.strip() for line in text.splitlines()).strip()
+
+
+def _baseline_sections(text):
+    """Reference: the original split_into_sections line handling and grouping."""
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    sections = []
+    current_title, current_buf = "Introduction", []
+    for line in lines:
+        if _is_heading(line):
+            if current_buf:
+                sections.append((current_title, " ".join(current_buf)))
+                current_buf = []
+            current_title = line
+        else:
+            current_buf.append(line)
+    if current_buf:
+        sections.append((current_title, " ".join(current_buf)))
+    return sections
+
+
+NORMALIZE_CASES = [
+    ("Page One\nHello world text.\x0cPage Two", "Page One\nHello world text.\nPage Two"),
+    ("  Intro  \r\n body line \r\n\r\nEnd ", "Intro\nbody line\n\nEnd"),
+    ("a\rb\x0bc\u2028d\u2029e\x85f", "a\nb\nc\nd\ne\nf"),
+    ("\x1c x \x1d y \x1e z\x1f", "x\ny\nz"),
+    ("\t\n  \n", ""),
+]
+
+# Characters that exercise every splitlines() boundary and strip() rule
+_ALPHABET = list("ab .XY \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f\x85\xa0\u2028\u2029\u3000")
+
+
+def _random_texts(n=5000, seed=0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(0, 40)))
+
+SECTION_CASES = [
+    ("Page One\nHello world text.\x0cPage Two\x0cbody two", [
+        ("Page One", "Hello world text."),
+        ("Page Two", "body two"),
+    ]),
+    ("  Intro  \r\n body line \r\n\r\nEnd ", [("Intro", "body line")]),
+    ("a\rb\x0bc\u2028d\u2029e\x85f", [("Introduction", "a b c d e f")]),
+    ("\t\n  \n", []),
+]
+
+
+def test_normalize_text_golden():
+    for text, expected in NORMALIZE_CASES:
+        assert normalize_text(text) == expected, repr(text)
+
+
+def test_normalize_text_matches_baseline():
+    for text in _random_texts():
+        assert normalize_text(text) == _baseline_normalize(text), repr(text)
+
+
+def test_split_into_sections_golden():
+    for text, expected in SECTION_CASES:
+        assert split_into_sections(text) == expected, repr(text)
+
+
+def test_split_into_sections_matches_baseline():
+    for text in _random_texts():
+        assert split_into_sections(text) == _baseline_sections(text), repr(text)
+
+
+if __name__ == "__main__":
+    test_normalize_text_golden()
+    test_normalize_text_matches_baseline()
+    test_split_into_sections_golden()
+    test_split_into_sections_matches_baseline()
+    print("OK")
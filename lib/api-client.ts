@@ -22,3 +22,53 @@ export async function startAssessment(subject: string, topic: string) {
 
   return response.json()
 }
+
+export type BatchStreamEvent =
+  | { type: "session"; session_id: string; count: number }
+  | { type: "question"; index: number; question: any }
+  | { type: "done"; session_id: string }
+
+// Streams /generate-batch/stream (NDJSON) and calls onEvent as each line
+// arrives, so the first question can render before the batch finishes.
+export async function streamBatchQuestions(
+  domain: string,
+  count: number,
+  difficulty: string,
+  onEvent: (event: BatchStreamEvent) => void
+) {
+  if (!BACKEND_URL) {
+    throw new Error("Backend URL is not defined")
+  }
+
+  const response = await fetch(
+    `${BACKEND_URL}/api/assessment/generate-batch/stream`,
+    {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ domain, count, difficulty }),
+    }
+  )
+
+  if (!response.ok || !response.body) {
+    throw new Error("Failed to generate questions")
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+
+  while (true) {
+    const { done, value } = await reader.read()
+    buffer += decoder.decode(value, { stream: !done })
+    const lines = buffer.split("\n")
+    buffer = lines.pop() ?? ""
+    for (const line of lines) {
+      if (line.trim()) {
+        onEvent(JSON.parse(line))
+      }
+    }
+    if (done) break
+  }
+}